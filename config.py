@@ -57,6 +57,11 @@ class HierConfig(Config):
     committee_size = 3  # Number of validator committee members
     committee_base_port = 8700
     consensus_threshold = 2  # Minimum votes needed (majority)
+    vote_batch_window = 0.003  # Seconds to coalesce outbound votes into one POST per peer
+    vote_batch_max = 64  # Upper bound on votes per batched POST
+    vote_record_ttl = 300  # Seconds before votes for a share that never reached consensus are dropped
+    max_vote_records = 10000  # Cap on shares with outstanding votes (oldest dropped first)
+    validated_share_history = 10000  # Validated share ids kept for status reporting
     
     # Trusted Authority Configuration
     ta_port = 7600
@@ -82,11 +87,14 @@ class HierConfig(Config):
     # Proof-of-Work Parameters for Sybil Resistance  
     pow_difficulty = 4  # Number of leading zeros required in hash
     pow_target = 2**(256 - pow_difficulty)  # Difficulty target
+    pow_parallel_min_difficulty = 16  # Spread the nonce search across all CPU cores from this difficulty up
+    pow_parallel_timeout = 300  # Seconds to wait for the parallel search before falling back to the serial solver
     
     # Byzantine Fault Tolerance
     max_byzantine_nodes = 1  # Maximum number of Byzantine nodes tolerated
     
     # Communication and Security
+    fog_wire_dtype = 'float16'  # Precision of fog-to-leader uploads ('float32' sends full precision)
     enable_encryption = True
     signature_verification = True
     
@@ -94,6 +102,7 @@ class HierConfig(Config):
     hier_training_rounds = 3  # Updated to match main config
     hier_epochs = 1
     hier_batch_size = 32
+    hier_jit_compile = True  # XLA-compile the facility train/eval steps (fixed MNIST shapes, compiled once)
     
     # Dataset distribution per facility
     @property
@@ -5,17 +5,46 @@ import subprocess
 import urllib.parse
 import os
 import threading
-import json
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import flcommon
+
 PORT = 5000
 
 # Track running processes and their progress
 running_processes = {}
 progress_data = {}
 
+# All config.py reads/writes go through these helpers so handler threads share
+# one lock and skip re-reading the file while its mtime is unchanged
+CONFIG_PATH = 'config.py'
+config_file_lock = threading.Lock()
+config_file_cache = {'mtime': None, 'content': None}
+
+def read_config_file():
+    """Return the contents of config.py, re-reading only when it changed on disk"""
+    with config_file_lock:
+        mtime = os.stat(CONFIG_PATH).st_mtime_ns
+        if config_file_cache['mtime'] != mtime:
+            with open(CONFIG_PATH, 'r') as f:
+                config_file_cache['content'] = f.read()
+            config_file_cache['mtime'] = mtime
+        return config_file_cache['content']
+
+def write_config_file(content):
+    """Write config.py and refresh the cached contents"""
+    with config_file_lock:
+        with open(CONFIG_PATH, 'w') as f:
+            f.write(content)
+        config_file_cache['content'] = content
+        config_file_cache['mtime'] = os.stat(CONFIG_PATH).st_mtime_ns
+
+# Encoded /current_config response, keyed by the config.py mtime it was built from
+config_json_cache = {'entry': (None, b'')}
+
 def parse_logs_for_progress(algorithm):
     """Parse log files to extract training progress"""
     # Import and reload config to get current values
@@ -299,6 +328,8 @@ def parse_logs_for_progress(algorithm):
     return progress
 
 class EnhancedFedShareHandler(http.server.SimpleHTTPRequestHandler):
+    homepage_body = None  # Encoded once on first request, the page is static
+
     def do_POST(self):
         if self.path == '/config':
             self.update_config()
@@ -1548,7 +1579,9 @@ class EnhancedFedShareHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Pragma', 'no-cache')
         self.send_header('Expires', '0')
         self.end_headers()
-        self.wfile.write(html.encode())
+        if EnhancedFedShareHandler.homepage_body is None:
+            EnhancedFedShareHandler.homepage_body = html.encode()
+        self.wfile.write(EnhancedFedShareHandler.homepage_body)
     
     def get_progress(self, algorithm):
         """Get real-time progress for an algorithm"""
@@ -1558,7 +1591,7 @@ class EnhancedFedShareHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Content-type', 'application/json')
         self.send_header('Cache-Control', 'no-cache')
         self.end_headers()
-        self.wfile.write(json.dumps(progress).encode())
+        self.wfile.write(flcommon.json_dumps_bytes(progress))
     
     def run_algorithm(self, algorithm):
         if algorithm not in ['fedshare', 'fedavg', 'scotch', 'hierfed']:
@@ -1967,50 +2000,57 @@ class EnhancedFedShareHandler(http.server.SimpleHTTPRequestHandler):
         self.send_response(200)
         self.send_header('Content-type', 'application/json')
         self.end_headers()
-        self.wfile.write(json.dumps(status).encode())
+        self.wfile.write(flcommon.json_dumps_bytes(status))
     
     def get_current_config(self):
         """Get current configuration from config.py"""
         try:
-            # Import config to get current values
-            import importlib
-            import config
-            importlib.reload(config)  # Reload to get latest values
-            
-            current_config = {
-                'number_of_clients': config.Config.number_of_clients,
-                'num_servers': config.Config.num_servers,
-                'training_rounds': config.Config.training_rounds,
-                'batch_size': config.Config.batch_size,
-                'train_dataset_size': config.Config.train_dataset_size,
-                'epochs': config.Config.epochs
-            }
-            
-            # Add HierConfig parameters if available
-            if hasattr(config, 'HierConfig'):
-                hier_config = {
-                    'hier_facilities': config.HierConfig.number_of_facilities,
-                    'hier_fog_nodes': config.HierConfig.num_fog_nodes,
-                    'hier_validators': config.HierConfig.committee_size,
-                    'hier_training_rounds': config.HierConfig.hier_training_rounds,
-                    'dp_enabled': config.HierConfig.dp_enabled,
-                    'dp_epsilon': config.HierConfig.dp_epsilon,
-                    'dp_delta': config.HierConfig.dp_delta,
-                    'dp_clip_norm': config.HierConfig.dp_clip_norm,
-                    'dp_mechanism': config.HierConfig.dp_mechanism,
-                    'dp_noise_multiplier': config.HierConfig.dp_noise_multiplier,
-                    'secret_sharing_enabled': config.HierConfig.secret_sharing_enabled,
-                    'secret_num_shares': config.HierConfig.secret_num_shares,
-                    'secret_threshold': config.HierConfig.secret_threshold,
-                    'share_signing_enabled': config.HierConfig.share_signing_enabled
+            # Rebuild the response only when config.py changed since the last poll
+            mtime = os.stat(CONFIG_PATH).st_mtime_ns
+            cached_mtime, body = config_json_cache['entry']
+            if cached_mtime != mtime:
+                # Import config to get current values
+                import importlib
+                import config
+                importlib.reload(config)  # Reload to get latest values
+                
+                current_config = {
+                    'number_of_clients': config.Config.number_of_clients,
+                    'num_servers': config.Config.num_servers,
+                    'training_rounds': config.Config.training_rounds,
+                    'batch_size': config.Config.batch_size,
+                    'train_dataset_size': config.Config.train_dataset_size,
+                    'epochs': config.Config.epochs
                 }
-                current_config.update(hier_config)
+            
+                # Add HierConfig parameters if available
+                if hasattr(config, 'HierConfig'):
+                    hier_config = {
+                        'hier_facilities': config.HierConfig.number_of_facilities,
+                        'hier_fog_nodes': config.HierConfig.num_fog_nodes,
+                        'hier_validators': config.HierConfig.committee_size,
+                        'hier_training_rounds': config.HierConfig.hier_training_rounds,
+                        'dp_enabled': config.HierConfig.dp_enabled,
+                        'dp_epsilon': config.HierConfig.dp_epsilon,
+                        'dp_delta': config.HierConfig.dp_delta,
+                        'dp_clip_norm': config.HierConfig.dp_clip_norm,
+                        'dp_mechanism': config.HierConfig.dp_mechanism,
+                        'dp_noise_multiplier': config.HierConfig.dp_noise_multiplier,
+                        'secret_sharing_enabled': config.HierConfig.secret_sharing_enabled,
+                        'secret_num_shares': config.HierConfig.secret_num_shares,
+                        'secret_threshold': config.HierConfig.secret_threshold,
+                        'share_signing_enabled': config.HierConfig.share_signing_enabled
+                    }
+                    current_config.update(hier_config)
+                
+                body = flcommon.json_dumps_bytes(current_config)
+                config_json_cache['entry'] = (mtime, body)
             
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Cache-Control', 'no-cache')
             self.end_headers()
-            self.wfile.write(json.dumps(current_config).encode())
+            self.wfile.write(body)
             
         except Exception as e:
             print(f"Error getting current config: {str(e)}")
@@ -2022,7 +2062,7 @@ class EnhancedFedShareHandler(http.server.SimpleHTTPRequestHandler):
             # Get the request body
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
-            new_config = json.loads(post_data.decode('utf-8'))
+            new_config = flcommon.json_loads(post_data)
             
             # Validate the configuration
             required_fields = ['clients', 'rounds', 'batch_size', 'train_dataset_size', 'epochs']
@@ -2052,8 +2092,7 @@ class EnhancedFedShareHandler(http.server.SimpleHTTPRequestHandler):
                 return
             
             # Read current config.py
-            with open('config.py', 'r') as f:
-                config_content = f.read()
+            config_content = read_config_file()
             
             # Update the configuration values
             config_content = re.sub(
@@ -2088,8 +2127,7 @@ class EnhancedFedShareHandler(http.server.SimpleHTTPRequestHandler):
             )
             
             # Write the updated config back
-            with open('config.py', 'w') as f:
-                f.write(config_content)
+            write_config_file(config_content)
             
             print(f"Configuration updated: {new_config}")
             
@@ -2107,11 +2145,10 @@ class EnhancedFedShareHandler(http.server.SimpleHTTPRequestHandler):
         try:
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
-            dp_config = json.loads(post_data.decode('utf-8'))
+            dp_config = flcommon.json_loads(post_data)
             
             # Read current config.py
-            with open('config.py', 'r') as f:
-                config_content = f.read()
+            config_content = read_config_file()
             
             # Update differential privacy configuration values
             config_content = re.sub(
@@ -2146,8 +2183,7 @@ class EnhancedFedShareHandler(http.server.SimpleHTTPRequestHandler):
             )
             
             # Write the updated config back
-            with open('config.py', 'w') as f:
-                f.write(config_content)
+            write_config_file(config_content)
             
             print(f"Differential Privacy configuration updated: {dp_config}")
             
@@ -2165,11 +2201,10 @@ class EnhancedFedShareHandler(http.server.SimpleHTTPRequestHandler):
         try:
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
-            ss_config = json.loads(post_data.decode('utf-8'))
+            ss_config = flcommon.json_loads(post_data)
             
             # Read current config.py
-            with open('config.py', 'r') as f:
-                config_content = f.read()
+            config_content = read_config_file()
             
             # Update secret sharing and hierarchical federated learning configuration values
             config_content = re.sub(
@@ -2209,8 +2244,7 @@ class EnhancedFedShareHandler(http.server.SimpleHTTPRequestHandler):
             )
             
             # Write the updated config back
-            with open('config.py', 'w') as f:
-                f.write(config_content)
+            write_config_file(config_content)
             
             print(f"Secret Sharing configuration updated: {ss_config}")
             
@@ -2226,11 +2260,11 @@ class EnhancedFedShareHandler(http.server.SimpleHTTPRequestHandler):
     def update_hier_config(self):
         content_length = int(self.headers['Content-Length'])
         post_data = self.rfile.read(content_length)
-        data = json.loads(post_data.decode('utf-8'))
+        data = flcommon.json_loads(post_data)
         
         try:
             # Update config.py file with new hierarchical FL values
-            config_content = open('config.py', 'r').read()
+            config_content = read_config_file()
             
             # Update DP parameters
             dp_updates = {
@@ -2264,8 +2298,7 @@ class EnhancedFedShareHandler(http.server.SimpleHTTPRequestHandler):
                 )
             
             # Write updated config back
-            with open('config.py', 'w') as f:
-                f.write(config_content)
+            write_config_file(config_content)
             
             # Reload config module
             import importlib
@@ -2352,6 +2385,29 @@ class EnhancedFedShareHandler(http.server.SimpleHTTPRequestHandler):
 class ReusableTCPServer(socketserver.TCPServer):
     allow_reuse_address = True
 
+class ThreadPoolHTTPServer(http.server.HTTPServer):
+    """HTTP server that handles requests on a bounded pool of worker threads"""
+    allow_reuse_address = True
+    
+    def __init__(self, server_address, handler_class, max_workers):
+        super().__init__(server_address, handler_class)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='http-worker')
+    
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_worker, request, client_address)
+    
+    def process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+    
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
 def start_server():
     import socketserver
     
@@ -2363,7 +2419,12 @@ def start_server():
         allow_reuse_address = True
     
     try:
-        httpd = ThreadingHTTPServer(("0.0.0.0", PORT), EnhancedFedShareHandler)
+        # Bounded worker pool by default; HTTP_SERVER_MODE=threading restores thread-per-request
+        if os.getenv('HTTP_SERVER_MODE', 'pool') == 'threading':
+            httpd = ThreadingHTTPServer(("0.0.0.0", PORT), EnhancedFedShareHandler)
+        else:
+            workers = int(os.getenv('HTTP_WORKERS', 16))
+            httpd = ThreadPoolHTTPServer(("0.0.0.0", PORT), EnhancedFedShareHandler, workers)
         print(f"🚀 Enhanced FedShare server running on http://0.0.0.0:{PORT}", flush=True)
         print("Enhanced interface with real-time progress tracking!", flush=True)
         httpd.serve_forever()
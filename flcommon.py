@@ -1,11 +1,39 @@
+import base64
+import hashlib
 import ipaddress
+import json
 import pickle
+import struct
+import zlib
 
 import numpy as np
 import threading
 import ipaddress
 import requests
+from requests.adapters import HTTPAdapter
 from requests_toolbelt.adapters import source
+from urllib3.util.retry import Retry
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
 # ------------------------------------------------------------------------------
 # Decimal-Integer Conversion
 # ------------------------------------------------------------------------------
@@ -127,6 +155,148 @@ def send_to_client(client, pickle_model, config, lead_server):
     print(f"[CLIENT] model sent to client {client}")
 
 
+def json_dumps_bytes(obj):
+    """Serialize to JSON bytes, with orjson's C encoder when installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+
+def json_loads(data):
+    """Parse JSON from bytes or str, with orjson when installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def canonical_json(data):
+    """Deterministic JSON bytes (sorted keys, non-JSON types as str) for signatures and Merkle leaves"""
+    # Facilities and validators must both call this one function: validators recompute the facility's
+    # Merkle leaves, so any drift between two encodings fails verification. Always the stdlib encoder
+    # (never orjson, whose UTF-8, float and numpy output differ) so every host signs the same bytes.
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=True, default=str).encode()
+
+
+def _base64_bytes(obj):
+    """JSON fallback for bytes values: base64 text, as the receivers already accept"""
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return base64.b64encode(obj).decode('ascii')
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def pack_payload(obj):
+    """Encode an HTTP body as msgpack (bytes values travel raw) when installed, else as JSON with
+    bytes base64-encoded. Returns (body, headers)"""
+    if MSGPACK_AVAILABLE:
+        return msgpack.packb(obj, use_bin_type=True), {'Content-Type': MSGPACK_MIMETYPE}
+    if ORJSON_AVAILABLE:
+        body = orjson.dumps(obj, default=_base64_bytes)
+    else:
+        body = json.dumps(obj, default=_base64_bytes).encode()
+    return body, {'Content-Type': 'application/json'}
+
+
+def unpack_request_payload(req):
+    """Decode a Flask request body sent by pack_payload, or a plain JSON body"""
+    if req.mimetype == MSGPACK_MIMETYPE:
+        return msgpack.unpackb(req.get_data(cache=False), raw=False)
+    return req.get_json()
+
+
+def install_orjson_provider(app):
+    """Make jsonify/request.get_json on a Flask app use orjson when both it and Flask's provider API are available"""
+    if not ORJSON_AVAILABLE:
+        return
+    try:
+        from flask.json.provider import DefaultJSONProvider
+    except ImportError:
+        return  # Flask < 2.2 has no pluggable JSON provider
+
+    class OrjsonProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = OrjsonProvider(app)
+
+
+def weights_parts(weights):
+    """Buffers making up serialize_weights(weights), for callers that join them into a larger frame"""
+    arrays = [np.asarray(w, order='C') for w in weights]
+    header = json_dumps_bytes([[list(a.shape), a.dtype.str] for a in arrays])
+    return [struct.pack('<I', len(header)), header] + arrays
+
+
+def serialize_weights(weights):
+    """Pack a list of numpy arrays as a length-prefixed JSON header of shapes/dtypes followed by the raw buffers"""
+    return b''.join(weights_parts(weights))
+
+
+def weights_digest(weights):
+    """SHA-256 hex digest over each array's shape, dtype and raw buffer, without converting elements to Python"""
+    digest = hashlib.sha256()
+    for w in weights:
+        a = np.asarray(w, order='C')
+        digest.update(f"{a.shape}{a.dtype.str}".encode())
+        digest.update(a)
+    return digest.hexdigest()
+
+
+def deserialize_weights(data):
+    """Inverse of serialize_weights, layers are read-only views over data"""
+    (header_len,) = struct.unpack_from('<I', data, 0)
+    offset = 4 + header_len
+    layout = json_loads(bytes(data[4:offset]))
+    weights = []
+    for shape, dtype_str in layout:
+        dtype = np.dtype(dtype_str)
+        count = int(np.prod(shape, dtype=np.int64))
+        weights.append(np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape))
+        offset += count * dtype.itemsize
+    return weights
+
+
+def pack_weights_message(metadata, weights):
+    """Frame a length-prefixed JSON metadata envelope followed by serialize_weights(weights), without pickle"""
+    envelope = json_dumps_bytes(metadata)
+    return b''.join([struct.pack('<I', len(envelope)), envelope] + weights_parts(weights))
+
+
+def unpack_weights_message(data):
+    """Inverse of pack_weights_message, returns (metadata, weights) with weights as views over data"""
+    view = memoryview(data)
+    (envelope_len,) = struct.unpack_from('<I', view, 0)
+    metadata = json_loads(bytes(view[4:4 + envelope_len]))
+    return metadata, deserialize_weights(view[4 + envelope_len:])
+
+
+def compress_bytes(data, level=3):
+    """Compress a payload for transport, zstd (multi-threaded) at the given level when installed, zlib otherwise"""
+    if ZSTD_AVAILABLE:
+        return zstandard.ZstdCompressor(level=level, threads=-1).compress(data)
+    return zlib.compress(data, 1 if level <= 1 else 6)
+
+
+def decompress_bytes(data):
+    """Inverse of compress_bytes, the codec is detected from the frame header"""
+    if data[:4] == ZSTD_MAGIC:
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def pooled_session(pool_connections=10, pool_maxsize=10, retries=0):
+    """Create a requests.Session that keeps HTTP connections alive and reuses them across calls"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections,
+                          pool_maxsize=pool_maxsize,
+                          max_retries=Retry(total=retries, backoff_factor=0.1))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
 def get_ip(config):
     return config.client_address
 
@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
+import os
 import pickle
+import select
+import subprocess
 import sys
 import threading
 import hashlib
 import time
 import secrets
-import json
 import base64
+import functools
+import ssl
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import requests
@@ -27,7 +32,32 @@ config = HierFacilityConfig(int(sys.argv[1]))
 
 facility_datasets = mnistcommon.load_train_dataset(config.number_of_facilities, permute=True)
 
+# Build the local input pipelines once. tf.data cannot take validation_split, so hold out the tail
+# of the facility data the same way Keras does and keep both halves cached as tensors across rounds.
+x_train, y_train = facility_datasets[config.facility_index][0], facility_datasets[config.facility_index][1]
+num_fit_samples = int(len(x_train) * (1. - config.validation_split))
+train_dataset = (tf.data.Dataset.from_tensor_slices((x_train[:num_fit_samples], y_train[:num_fit_samples]))
+                 .cache()
+                 .shuffle(num_fit_samples, seed=42)
+                 .batch(config.hier_batch_size)
+                 .prefetch(tf.data.AUTOTUNE))
+validation_dataset = (tf.data.Dataset.from_tensor_slices((x_train[num_fit_samples:], y_train[num_fit_samples:]))
+                      .batch(256)
+                      .cache()
+                      .prefetch(tf.data.AUTOTUNE)) if num_fit_samples < len(x_train) else None
+
+# Build and compile the model once; each round only swaps in the global weights
+model = mnistcommon.get_model(jit_compile=config.hier_jit_compile)
+# Snapshot the fresh Adam state (moments, iteration count): every round restarts from it, as it did
+# when the model was rebuilt per round, instead of carrying local moments across global updates
+model.optimizer.build(model.trainable_variables)
+initial_optimizer_state = [variable.numpy() for variable in model.optimizer.variables]
+x_test, y_test = mnistcommon.load_test_dataset()
+# Evaluation runs every round on the same data: batch once, keep the tensors cached and prefetch ahead of the model
+test_dataset = tf.data.Dataset.from_tensor_slices((x_test, y_test)).batch(256).cache().prefetch(tf.data.AUTOTUNE)
+
 api = Flask(__name__)
+flcommon.install_orjson_provider(api)
 
 round_weight = 0
 training_round = 0
@@ -36,26 +66,80 @@ total_download_cost = 0
 facility_private_key = secrets.token_hex(32)  # Simulated private key
 facility_public_key = hashlib.sha256(facility_private_key.encode()).hexdigest()
 
+# Endpoints are fixed for the lifetime of the process, build them once and reuse one session
+validator_urls = [f'http://{config.server_address}:{config.committee_base_port + validator_index}/validate_share'
+                  for validator_index in range(config.committee_size)]
+ta_register_url = f'http://{config.ta_address}:{config.ta_port}/register_facility'
+http_session = flcommon.pooled_session(pool_connections=max(8, config.committee_size), pool_maxsize=64, retries=2)
+
 # Proof-of-Work for Sybil Resistance
+# Nonce search run in a fresh interpreter per core. Forking this multithreaded process (TensorFlow, Flask)
+# can deadlock, and spawn/forkserver children would re-import this module with its datasets and model.
+# argv: start, stride, challenge suffix (hex), target max (hex); prints the winning nonce.
+POW_WORKER_SOURCE = '''
+import hashlib, sys
+nonce, stride = int(sys.argv[1]), int(sys.argv[2])
+suffix, target_max = bytes.fromhex(sys.argv[3]), bytes.fromhex(sys.argv[4])
+while hashlib.sha256(b"%d" % nonce + suffix).digest() > target_max:
+    nonce += stride
+print(nonce, flush=True)
+'''
+
+def solve_proof_of_work_parallel(challenge_suffix, target_max, timeout):
+    """Split the nonce space across one worker interpreter per core, the first solution wins"""
+    num_workers = os.cpu_count() or 1
+    workers = [subprocess.Popen([sys.executable, '-c', POW_WORKER_SOURCE, str(i), str(num_workers),
+                                 challenge_suffix.hex(), target_max.hex()], stdout=subprocess.PIPE)
+               for i in range(num_workers)]
+    try:
+        ready, _, _ = select.select([worker.stdout for worker in workers], [], [], timeout)
+        if not ready:
+            raise TimeoutError(f"no PoW solution within {timeout}s")
+        # A crashed worker reports EOF, which fails the int() parse
+        nonce = int(ready[0].readline())
+    finally:
+        for worker in workers:
+            worker.kill()
+            worker.wait()
+    
+    digest = hashlib.sha256(b'%d' % nonce + challenge_suffix).digest()
+    if digest > target_max:
+        raise ValueError(f"worker returned invalid nonce {nonce}")
+    return nonce, digest.hex()
+
 def solve_proof_of_work(facility_id, target_difficulty):
     """Solve Proof-of-Work challenge to prevent Sybil attacks"""
     nonce = 0
-    facility_data = f"{facility_id}||{facility_public_key}"
+    # The nonce leads the challenge input, so only the facility suffix can be encoded once up front
+    challenge_suffix = f"||{facility_id}||{facility_public_key}".encode()
+    # digest < target  <=>  digest <= target - 1, compared as big-endian bytes without building ints
+    target_max = (config.pow_target - 1).to_bytes(32, 'big')
+    
+    # Low difficulties solve in a handful of hashes, starting workers only pays off for hard targets
+    if target_difficulty >= config.pow_parallel_min_difficulty:
+        try:
+            nonce, hash_result = solve_proof_of_work_parallel(challenge_suffix, target_max, config.pow_parallel_timeout)
+            print(f"Facility {facility_id} solved PoW challenge with nonce: {nonce}")
+            return nonce, hash_result
+        except (OSError, ValueError, TimeoutError) as e:
+            print(f"Parallel PoW search failed ({e}), falling back to the serial solver")
     
     while True:
-        challenge_input = f"{nonce}||{facility_data}"
-        hash_result = hashlib.sha256(challenge_input.encode()).hexdigest()
+        digest = hashlib.sha256(b'%d' % nonce + challenge_suffix).digest()
         
         # Check if hash has required number of leading zeros
-        if int(hash_result, 16) < config.pow_target:
+        if digest <= target_max:
             print(f"Facility {facility_id} solved PoW challenge with nonce: {nonce}")
-            return nonce, hash_result
+            return nonce, digest.hex()
         
         nonce += 1
         if nonce % 10000 == 0:
             print(f"Facility {facility_id} PoW attempt: {nonce}")
 
 # Differential Privacy - Add Gaussian noise to model parameters
+# Fresh OS entropy for DP noise, independent of the fixed seeds used for model initialization
+dp_rng = np.random.default_rng()
+
 def add_differential_privacy(model_weights, hier_config):
     """Add production-grade differential privacy using Gaussian mechanism"""
     if not hier_config.dp_enabled:
@@ -64,21 +148,24 @@ def add_differential_privacy(model_weights, hier_config):
         
     from production_crypto import ProductionDifferentialPrivacy
     
-    dp = ProductionDifferentialPrivacy()
+    # Flatten all layers into one float32 vector so clipping and noise are single vectorized passes.
+    # Noise calibration is done in float32 even when weights are transported in lower precision.
+    shapes = [np.shape(w) for w in model_weights]
+    flat = np.concatenate([np.ravel(w) for w in model_weights], dtype=np.float32)
     
-    noisy_weights = []
-    for layer_weights in model_weights:
-        # Clip gradients for bounded sensitivity using configured norm
-        clipped_weights = dp.clip_gradients([layer_weights], max_norm=hier_config.dp_clip_norm)[0]
-        
-        # Add calibrated Gaussian noise for (ε,δ)-differential privacy using HierConfig
-        noisy_layer = dp.add_gaussian_noise(
-            clipped_weights, 
-            hier_config.dp_epsilon, 
-            hier_config.dp_delta,
-            sensitivity=1.0
-        )
-        noisy_weights.append(noisy_layer)
+    # Clip the global L2 norm for bounded sensitivity using configured norm
+    weights_norm = np.linalg.norm(flat)
+    if weights_norm > hier_config.dp_clip_norm:
+        flat *= np.float32(hier_config.dp_clip_norm / weights_norm)
+    
+    # Add calibrated Gaussian noise for (ε,δ)-differential privacy using HierConfig, in one draw
+    noise = dp_rng.standard_normal(flat.size, dtype=np.float32)
+    noise *= ProductionDifferentialPrivacy.gaussian_noise_scale(hier_config.dp_epsilon, hier_config.dp_delta,
+                                                                sensitivity=1.0)
+    flat += noise
+    
+    split_points = np.cumsum([int(np.prod(shape)) for shape in shapes])[:-1]
+    noisy_weights = [part.reshape(shape) for part, shape in zip(np.split(flat, split_points), shapes)]
     
     print(f"Applied production-grade differential privacy (ε={hier_config.dp_epsilon}, δ={hier_config.dp_delta}, clip_norm={hier_config.dp_clip_norm})")
     return noisy_weights
@@ -96,31 +183,31 @@ def sign_data(data, private_key):
         rsa_signer = ProductionRSA()
         rsa_signer.load_private_key(private_key.encode() if isinstance(private_key, str) else private_key)
         
-        data_str = json.dumps(data, sort_keys=True, default=str)
-        signature = rsa_signer.sign(data_str.encode())
+        signature = rsa_signer.sign(flcommon.canonical_json(data))
         return signature.hex()  # Return as hex string for JSON compatibility
         
     except Exception as e:
         print(f"Error in production signature: {e}, falling back to HMAC")
         # Fallback to HMAC-based signature
-        data_str = json.dumps(data, sort_keys=True, default=str)
-        signature_input = f"{data_str}||{private_key}"
-        signature = hashlib.sha256(signature_input.encode()).hexdigest()
+        signature_input = flcommon.canonical_json(data) + f"||{private_key}".encode()
+        signature = hashlib.sha256(signature_input).hexdigest()
         return signature
 
-def send_to_validator_committee(share_data, share_index):
+def send_to_validator_committee(share_data, share_index, share_leaf, merkle_proof, merkle_root, root_signature):
     """Send secret share to ALL validator committee members for consensus"""
-    # Create deterministic share UID for consensus
-    import hashlib
-    share_content = json.dumps(share_data, sort_keys=True, default=str)
-    share_uid = hashlib.sha256(f"{config.facility_index}:{share_index}:{training_round}:{share_content}".encode()).hexdigest()
+    # Create deterministic share UID for consensus from the share's 32-byte Merkle leaf, which already
+    # commits to its content, instead of hashing the multi-MB share a second time
+    share_uid = hashlib.sha256(f"{config.facility_index}:{share_index}:{training_round}:".encode() + share_leaf).hexdigest()
     
     # Create signed share
     signed_share = {
         'facility_id': config.facility_index,
         'share': share_data,
         'share_uid': share_uid,  # Deterministic ID for consensus
-        'signature': sign_data(share_data, facility_private_key),
+        # One signature over the round's Merkle root covers every share; the proof ties this share to it
+        'signature': root_signature,
+        'merkle_root': merkle_root,
+        'merkle_proof': merkle_proof,
         'public_key': facility_public_key,
         'round': training_round,
         'timestamp': time.time()
@@ -128,12 +215,9 @@ def send_to_validator_committee(share_data, share_index):
     
     # Broadcast to ALL validators for proper consensus (FIX: was round-robin, now broadcasts to all)
     successful_sends = 0
-    for validator_index in range(config.committee_size):
-        validator_port = config.committee_base_port + validator_index
-        url = f'http://{config.server_address}:{validator_port}/validate_share'
-        
+    for validator_index, url in enumerate(validator_urls):
         try:
-            response = requests.post(url, json=signed_share, timeout=30)
+            response = http_session.post(url, json=signed_share, timeout=30)
             if response.status_code == 200:
                 print(f"Share {share_index} sent to validator {validator_index} successfully")
                 successful_sends += 1
@@ -163,9 +247,6 @@ def start_next_round(data):
         
     time_logger.client_start()
     
-    x_train, y_train = facility_datasets[config.facility_index][0], facility_datasets[config.facility_index][1]
-    
-    model = mnistcommon.get_model()
     global training_round, round_weight
     
     if training_round != 0:
@@ -173,6 +254,8 @@ def start_next_round(data):
             if data and len(data) > 0:
                 round_weight = pickle.loads(data)
                 model.set_weights(round_weight)
+                for variable, value in zip(model.optimizer.variables, initial_optimizer_state):
+                    variable.assign(value)
                 print(f"Successfully loaded global model weights for round {training_round + 1}")
             else:
                 print(f"Warning: Empty data received for round {training_round + 1}, using previous weights")
@@ -186,15 +269,13 @@ def start_next_round(data):
           f"Dataset Size: {len(x_train)}")
     
     # Local training
-    model.fit(x_train, y_train, 
+    model.fit(train_dataset, 
              epochs=config.hier_epochs, 
-             batch_size=config.hier_batch_size, 
              verbose=config.verbose,
-             validation_split=config.validation_split)
+             validation_data=validation_dataset)
     
     # Evaluate local facility performance
-    x_test, y_test = mnistcommon.load_test_dataset()
-    local_results = model.evaluate(x_test, y_test, verbose=0)
+    local_results = model.evaluate(test_dataset, verbose=0)
     local_loss = local_results[0]
     local_accuracy = local_results[1]
     
@@ -205,25 +286,22 @@ def start_next_round(data):
     # Get model weights for sharing
     model_weights = model.get_weights()
     
-    # OPTIMIZATION: Convert to float16 for 50% memory reduction
-    import numpy as np
-    optimized_weights = []
-    for weight_array in model_weights:
-        if weight_array.dtype in [np.float32, np.float64]:
-            # Convert to float16 for memory optimization
-            optimized_weights.append(weight_array.astype(np.float16))
-        else:
-            optimized_weights.append(weight_array)
-    
     # Apply differential privacy using HierConfig
-    dp_weights = add_differential_privacy(optimized_weights, config)
+    dp_weights = add_differential_privacy(model_weights, config)
     
-    # OPTIMIZATION: Reuse pickle buffer to avoid double serialization
-    import zlib
-    dp_weights_bytes = pickle.dumps(dp_weights)
-    compressed_weights = zlib.compress(dp_weights_bytes, level=6)
+    # OPTIMIZATION: Transport float16 weights, halving the bytes fed to compression, sharing and every POST.
+    # Fog nodes upcast to float32 when aggregating.
+    dp_weights = [w.astype(np.float16) if w.dtype in (np.float32, np.float64) else w for w in dp_weights]
+    
+    # OPTIMIZATION: Serialize once as raw array buffers (no pickle) and reuse the blob everywhere below
+    dp_weights_bytes = flcommon.serialize_weights(dp_weights)
+    compressed_weights = flcommon.compress_bytes(dp_weights_bytes)
     print(f"Compressed weights from {len(dp_weights_bytes)} to {len(compressed_weights)} bytes ({100*len(compressed_weights)/len(dp_weights_bytes):.1f}% of original)")
     
+    # Single-share fallback reuses the compressed blob, base64-encoded once so it survives the JSON POST
+    fallback_share = {'share_id': 1, 'share_data': base64.b64encode(compressed_weights).decode('ascii'),
+                      'threshold': 1, 'total_shares': 1, 'is_production': False}
+    
     # Create secret shares using Shamir's Secret Sharing (if enabled)
     if config.secret_sharing_enabled:
         # OPTIMIZATION: Run secret sharing in separate worker thread with timeout
@@ -249,7 +327,7 @@ def start_next_round(data):
         
         if worker_thread.is_alive():
             print("Secret sharing timed out - using simplified sharing")
-            secret_shares = [{'share_id': 1, 'share_data': pickle.dumps(dp_weights), 'threshold': 1, 'total_shares': 1, 'is_production': False}]
+            secret_shares = [fallback_share]
         else:
             try:
                 status, result = result_queue.get_nowait()
@@ -257,21 +335,30 @@ def start_next_round(data):
                     secret_shares = result
                 else:
                     print(f"Secret sharing failed: {result}")
-                    secret_shares = [{'share_id': 1, 'share_data': pickle.dumps(dp_weights), 'threshold': 1, 'total_shares': 1, 'is_production': False}]
+                    secret_shares = [fallback_share]
             except queue.Empty:
                 print("Secret sharing timeout - using simplified sharing")
-                secret_shares = [{'share_id': 1, 'share_data': pickle.dumps(dp_weights), 'threshold': 1, 'total_shares': 1, 'is_production': False}]
+                secret_shares = [fallback_share]
     else:
         print("Secret sharing disabled in configuration - using model weights directly")
-        secret_shares = [{'share_id': 1, 'share_data': pickle.dumps(dp_weights), 'threshold': 1, 'total_shares': 1, 'is_production': False}]
+        secret_shares = [fallback_share]
+    
+    # Commit to all shares with a Merkle root so the round needs one signature instead of one per share
+    from production_crypto import ProductionMerkleTree
+    share_contents = [flcommon.canonical_json(share) for share in secret_shares]
+    leaves = [ProductionMerkleTree.leaf_hash(content) for content in share_contents]
+    merkle_root, merkle_proofs = ProductionMerkleTree.build(leaves)
+    send_share = functools.partial(send_to_validator_committee,
+                                   merkle_root=merkle_root.hex(),
+                                   root_signature=sign_data(merkle_root.hex(), facility_private_key))
     
     # Send shares to validator committee for verification
     print(f"Sending {len(secret_shares)} secret shares to validator committee...")
     
-    successful_sends = 0
-    for i, share in enumerate(secret_shares):
-        if send_to_validator_committee(share, i):
-            successful_sends += 1
+    # Shares are independent, dispatch them concurrently so the round waits ~1 RTT instead of one per share
+    with ThreadPoolExecutor(max_workers=min(32, len(secret_shares))) as executor:
+        results = list(executor.map(send_share, secret_shares, range(len(secret_shares)), leaves, merkle_proofs))
+    successful_sends = sum(results)
     
     print(f"Successfully sent {successful_sends}/{len(secret_shares)} shares to validators")
     
@@ -283,16 +370,23 @@ def start_next_round(data):
     
     time_logger.client_idle()
 
+# Encoded health response, only the round number changes between polls
+health_response_cache = {'entry': (None, b'')}
+
 @api.route('/', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return {
-        "facility_id": config.facility_index,
-        "status": "healthy",
-        "algorithm": "hierarchical_federated",
-        "round": training_round,
-        "public_key": facility_public_key
-    }
+    cached_round, body = health_response_cache['entry']
+    if cached_round != training_round:
+        body = flcommon.json_dumps_bytes({
+            "facility_id": config.facility_index,
+            "status": "healthy",
+            "algorithm": "hierarchical_federated",
+            "round": training_round,
+            "public_key": facility_public_key
+        })
+        health_response_cache['entry'] = (training_round, body)
+    return api.response_class(body, mimetype='application/json')
 
 @api.route('/start_round', methods=['POST'])
 def start_round():
@@ -323,8 +417,7 @@ def register_facility():
     
     # Send registration to Trusted Authority
     try:
-        ta_url = f'http://{config.ta_address}:{config.ta_port}/register_facility'
-        response = requests.post(ta_url, json=registration_data, timeout=30)
+        response = http_session.post(ta_register_url, json=registration_data, timeout=30)
         
         if response.status_code == 200:
             result = response.json()
@@ -342,7 +435,7 @@ def register_facility():
 def receive_global_model():
     """Receive global model from Trusted Authority"""
     try:
-        encrypted_model_data = request.get_json()
+        encrypted_model_data = flcommon.unpack_request_payload(request)
         
         if not encrypted_model_data:
             print("Error: No model data received")
@@ -387,6 +480,7 @@ def receive_global_model():
 if __name__ == '__main__':
     print(f"Starting Hierarchical Federated Learning Facility {config.facility_index}")
     print(f"Facility Public Key: {facility_public_key[:16]}...")
+    print(f"PoW hash backend: {ssl.OPENSSL_VERSION} (SHA-256 uses SHA extensions when the CPU provides them)")
     print(f"Listening on port: {config.facility_port}")
     
     # Start the facility server
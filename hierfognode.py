@@ -1,25 +1,31 @@
 #!/usr/bin/env python3
-import pickle
+import os
 import sys
 import threading
 import hashlib
 import time
-import json
 
 import numpy as np
 import requests
 from flask import Flask, request, jsonify
 
+import flcommon
 import time_logger
 from config import HierFogNodeConfig
 
-config = HierFogNodeConfig(int(sys.argv[1]))
+# Under gunicorn argv belongs to the server, so the launcher passes the index through FOG_NODE_INDEX
+config = HierFogNodeConfig(int(os.environ.get('FOG_NODE_INDEX') or sys.argv[1]))
 
 api = Flask(__name__)
+flcommon.install_orjson_provider(api)
 
 training_round = 0
 received_shares = []
 shares_by_facility = {}  # Track shares by facility: {facility_id: [share1, share2, ...]}
+# Guards the share tables across Flask threads; aggregation_started makes the aggregation trigger one-shot
+state_lock = threading.Lock()
+aggregation_started = False
+aggregation_buffers = {}  # (layer index, shape) -> float32 FedAvg accumulator kept across rounds
 total_download_cost = 0
 total_upload_cost = 0
 
@@ -27,12 +33,14 @@ total_upload_cost = 0
 fog_node_private_key = f"fog_node_{config.fog_node_index}_private_key"
 fog_node_public_key = hashlib.sha256(fog_node_private_key.encode()).hexdigest()
 
+# Keep-alive connection to the leader server, reused every round
+leader_url = f'http://{config.server_address}:{config.leader_port}/receive_fog_aggregation'
+http_session = flcommon.pooled_session(pool_connections=4, pool_maxsize=16, retries=2)
+
 def verify_committee_signature(data, signature, committee_public_key):
     """Verify digital signature from validator committee"""
-    # Simplified signature verification
-    data_str = json.dumps(data, sort_keys=True, default=str)
-    expected_signature = hashlib.sha256(f"{data_str}||committee_signature".encode()).hexdigest()
-    
+    # Simplified signature verification: only the format is checked, so the share is not
+    # re-serialized and hashed for an expected signature that would never be compared.
     # In production, use proper cryptographic signature verification
     return len(signature) == 64 and signature.isalnum()  # Basic format check
 
@@ -47,53 +55,59 @@ def fedavg_aggregation(facility_models):
     
     print(f"Performing FedAvg aggregation on {len(facility_models)} facility models")
     
-    # Get the structure from the first model
-    first_facility_id = list(facility_models.keys())[0]
-    first_model = facility_models[first_facility_id]
+    models = list(facility_models.values())
+    num_facilities = len(models)
+    inv_num_facilities = np.float32(1.0 / num_facilities)
     
-    # Initialize aggregated model with zeros
+    # Sum each layer into a float32 accumulator in place, then scale once. Accumulators are reused
+    # across rounds (only one aggregation runs at a time and the result is copied when quantized for upload).
     aggregated_model = []
-    for layer in first_model:
-        aggregated_model.append(np.zeros_like(layer))
-    
-    # Sum all model parameters
-    num_facilities = len(facility_models)
-    for facility_id, model_params in facility_models.items():
-        for layer_idx, layer_params in enumerate(model_params):
-            aggregated_model[layer_idx] += layer_params / num_facilities
+    for layer_idx in range(len(models[0])):
+        shape = np.shape(models[0][layer_idx])
+        acc = aggregation_buffers.get((layer_idx, shape))
+        if acc is None:
+            acc = aggregation_buffers[(layer_idx, shape)] = np.empty(shape, dtype=np.float32)
+        np.copyto(acc, models[0][layer_idx])
+        for model_params in models[1:]:
+            np.add(acc, model_params[layer_idx], out=acc)
+        acc *= inv_num_facilities
+        aggregated_model.append(acc)
     
     print(f"FedAvg aggregation completed using {num_facilities} facilities")
     return aggregated_model
 
 def sign_aggregated_model(model_data):
     """Create digital signature for aggregated model"""
-    model_str = json.dumps([arr.tolist() if hasattr(arr, 'tolist') else arr for arr in model_data])
-    signature_input = f"{model_str}||{fog_node_private_key}"
+    # Bind the key to a digest of the raw array buffers instead of a JSON dump of every element
+    signature_input = f"{flcommon.weights_digest(model_data)}||{fog_node_private_key}"
     signature = hashlib.sha256(signature_input.encode()).hexdigest()
     return signature
 
-def send_to_leader_server(aggregated_model):
+def send_to_leader_server(aggregated_model, num_facilities):
     """Send aggregated model to leader server"""
-    # Create signed aggregated model
+    # Quantize floating-point layers for the wire (the leader sums in float32); sign what is actually sent
+    wire_dtype = np.dtype(config.fog_wire_dtype)
+    aggregated_model = [layer.astype(wire_dtype, copy=False) if layer.dtype.kind == 'f' else layer
+                        for layer in aggregated_model]
+    
+    # Create signed aggregated model; the weights travel as raw buffers after this JSON envelope
     signed_model = {
         'fog_node_id': config.fog_node_index,
-        'aggregated_model': aggregated_model,
         'signature': sign_aggregated_model(aggregated_model),
         'public_key': fog_node_public_key,
         'round': training_round,
         'timestamp': time.time(),
-        'num_facilities_aggregated': len(received_shares)
+        'num_facilities_aggregated': num_facilities
     }
     
     try:
-        leader_url = f'http://{config.server_address}:{config.leader_port}/receive_fog_aggregation'
+        # Serialize the model data for transmission as a typed header plus contiguous buffers (no pickle),
+        # then compress at a fast level: the upload is network-bound and the leader decodes at GB/s
+        serialized_model = flcommon.compress_bytes(flcommon.pack_weights_message(signed_model, aggregated_model), level=1)
         
-        # Serialize the model data for transmission
-        serialized_model = pickle.dumps(signed_model)
-        
-        response = requests.post(leader_url, data=serialized_model, 
-                               headers={'Content-Type': 'application/octet-stream'},
-                               timeout=60)
+        response = http_session.post(leader_url, data=serialized_model, 
+                                     headers={'Content-Type': 'application/octet-stream'},
+                                     timeout=60)
         
         global total_upload_cost
         total_upload_cost += len(serialized_model)
@@ -112,20 +126,46 @@ def send_to_leader_server(aggregated_model):
 
 def process_aggregation():
     """Process the aggregation when enough shares are received"""
+    global aggregation_started
+    try:
+        return run_aggregation()
+    finally:
+        with state_lock:
+            aggregation_started = False
+
+def run_aggregation():
+    """Reconstruct, average and forward this round's facility models"""
     global received_shares, shares_by_facility, training_round
     
     time_logger.server_start()
     
+    # Late duplicates from other validators keep arriving, so work on a snapshot of the share table
+    with state_lock:
+        round_shares = {fid: dict(shares) for fid, shares in shares_by_facility.items()}
+    
     print(f"Processing aggregation for fog node {config.fog_node_index}")
-    print(f"Received shares from {len(shares_by_facility)} facilities")
+    print(f"Received shares from {len(round_shares)} facilities")
     
     # Reconstruct model parameters from secret shares
-    facility_models = reconstruct_secret_shares(shares_by_facility)
+    facility_models = reconstruct_secret_shares(round_shares)
     
     if not facility_models:
         print("Failed to reconstruct facility models from shares")
         return False
     
+    # Reconstruction succeeded: free this round's fragment payloads now instead of holding them through
+    # aggregation and upload. The share table keeps its keys so late duplicates are still recognized.
+    del round_shares
+    with state_lock:
+        received_shares.clear()
+        for facility_shares in shares_by_facility.values():
+            for share_id in facility_shares:
+                facility_shares[share_id] = None
+    
+    # Facilities secret-share their compressed, serialized weights; decode them before averaging
+    facility_models = {facility_id: flcommon.deserialize_weights(flcommon.decompress_bytes(blob))
+                       for facility_id, blob in facility_models.items()}
+    
     # Perform FedAvg aggregation
     aggregated_model = fedavg_aggregation(facility_models)
     
@@ -134,12 +174,13 @@ def process_aggregation():
         return False
     
     # Send aggregated model to leader server
-    success = send_to_leader_server(aggregated_model)
+    success = send_to_leader_server(aggregated_model, len(facility_models))
     
     # Clear received shares for next round
-    received_shares.clear()
-    shares_by_facility.clear()
-    training_round += 1
+    with state_lock:
+        received_shares.clear()
+        shares_by_facility.clear()
+        training_round += 1
     
     print(f"[DOWNLOAD] Total download cost so far: {total_download_cost}")
     print(f"[UPLOAD] Total upload cost so far: {total_upload_cost}")
@@ -178,31 +219,34 @@ def receive_share():
             print(f"Invalid committee signature for share from facility {share_data.get('facility_id')}")
             return jsonify({"error": "Invalid committee signature"}), 401
         
-        # Store the verified share
-        received_shares.append(share_data)
-        
         # Track shares by facility, deduplicating based on share_id
         facility_id = share_data.get('facility_id')
         share_id = share_data.get('share', {}).get('share_id')
         
-        if facility_id not in shares_by_facility:
-            shares_by_facility[facility_id] = {}
-        
-        # Only store the first copy of each fragment (ignore duplicates from other validators)
-        if share_id not in shares_by_facility[facility_id]:
-            shares_by_facility[facility_id][share_id] = share_data
+        global aggregation_started
+        with state_lock:
+            # Store the verified share
+            received_shares.append(share_data)
+            
+            # Only store the first copy of each fragment (ignore duplicates from other validators)
+            facility_shares = shares_by_facility.setdefault(facility_id, {})
+            if share_id not in facility_shares:
+                facility_shares[share_id] = share_data
+            num_fragments = len(facility_shares)
+            
+            # Check if we have all required fragments from all facilities
+            all_facilities_ready = all(len(shares_by_facility.get(fid, ())) >= config.secret_num_shares_computed
+                                       for fid in range(config.number_of_facilities))
+            
+            # Only the arrival that completes the set starts aggregation
+            start_aggregation = all_facilities_ready and not aggregation_started
+            if start_aggregation:
+                aggregation_started = True
         
         print(f"Fog node {config.fog_node_index} received share from facility {facility_id}")
-        print(f"Facility {facility_id} has {len(shares_by_facility[facility_id])}/{config.secret_num_shares_computed} unique fragments")
-        
-        # Check if we have all required fragments from all facilities
-        all_facilities_ready = True
-        for fid in range(config.number_of_facilities):
-            if fid not in shares_by_facility or len(shares_by_facility[fid]) < config.secret_num_shares_computed:
-                all_facilities_ready = False
-                break
+        print(f"Facility {facility_id} has {num_fragments}/{config.secret_num_shares_computed} unique fragments")
         
-        if all_facilities_ready:
+        if start_aggregation:
             print(f"All facilities have provided required fragments, starting aggregation...")
             # Start aggregation in separate thread
             aggregation_thread = threading.Thread(target=process_aggregation)
@@ -219,8 +263,9 @@ def reset_round():
     """Reset for new training round"""
     global received_shares, shares_by_facility, training_round
     
-    received_shares.clear()
-    shares_by_facility.clear()
+    with state_lock:
+        received_shares.clear()
+        shares_by_facility.clear()
     print(f"Fog node {config.fog_node_index} reset for new round")
     
     return jsonify({"response": "reset_complete", "fog_node_id": config.fog_node_index})
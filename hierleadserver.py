@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
+import collections
 import pickle
 import threading
 import time
 import random
 import hashlib
+import hmac
 import json
 
 import numpy as np
@@ -17,9 +19,13 @@ from config import HierLeaderConfig
 config = HierLeaderConfig()
 
 api = Flask(__name__)
+flcommon.install_orjson_provider(api)
 
 # Leader server state
-fog_aggregations = []
+# Handlers append verified fog aggregations and release one permit each; a single aggregation
+# worker consumes the permits, so a complete set can never trigger two global aggregations
+fog_aggregations = collections.deque()
+fog_aggregation_arrived = threading.Semaphore(0)
 training_round = 0
 total_download_cost = 0
 total_upload_cost = 0
@@ -28,15 +34,19 @@ leader_public_key = hashlib.sha256(leader_private_key.encode()).hexdigest()
 
 run_start_time = time.time()
 
-def verify_fog_node_signature(model_data, signature, fog_node_public_key):
+# Keep-alive connection to the Trusted Authority, reused every round
+ta_distribute_url = f"http://{config.ta_address}:{config.ta_port}/distribute_global_model"
+http_session = flcommon.pooled_session(pool_connections=4, pool_maxsize=16, retries=2)
+
+def verify_fog_node_signature(model_data, signature, fog_node_public_key, fog_node_id):
     """Verify digital signature from fog node"""
     try:
-        # Recreate the signature for verification
-        model_str = json.dumps([arr.tolist() if hasattr(arr, 'tolist') else arr for arr in model_data])
-        expected_signature_input = f"{model_str}||fog_node_private_key"
+        # Recreate the signature exactly as sign_aggregated_model does: key bound to the raw-buffer digest
+        # (fog node keys are simulated as f"fog_node_{id}_private_key"; in production, use real signatures)
+        expected_signature_input = f"{flcommon.weights_digest(model_data)}||fog_node_{fog_node_id}_private_key"
+        expected_signature = hashlib.sha256(expected_signature_input.encode()).hexdigest()
         
-        # In production, use proper cryptographic signature verification
-        return len(signature) == 64 and signature.isalnum()
+        return hmac.compare_digest(signature, expected_signature)
         
     except Exception as e:
         print(f"Signature verification error: {e}")
@@ -67,15 +77,13 @@ def global_aggregation(fog_aggregations):
     # Each fog node has already performed weighted averaging of its facilities
     global_model = []
     
-    # Initialize with first fog model structure
-    first_fog_model = fog_models[0]
-    for layer in first_fog_model:
-        global_model.append(np.zeros_like(layer))
-    
-    # Sum contributions from all fog nodes
-    for fog_model in fog_models:
-        for layer_idx, layer_params in enumerate(fog_model):
-            global_model[layer_idx] += layer_params
+    # Seed each layer with a writable float32 copy of the first fog model (received arrays are read-only,
+    # possibly float16 views) and add the rest in place, so no zero-fill or per-addition temporaries
+    for layer_idx in range(len(fog_models[0])):
+        acc = np.array(fog_models[0][layer_idx], dtype=np.float32)
+        for fog_model in fog_models[1:]:
+            np.add(acc, fog_model[layer_idx], out=acc)
+        global_model.append(acc)
     
     # No need to divide by number of fog nodes since each fog node
     # already performed proper weighted averaging
@@ -90,56 +98,63 @@ def encrypt_global_model(global_model, access_policy="hospital AND region=north"
     
     model_data = pickle.dumps(global_model)
     
+    # Hash the pickle once: the signature continues from a copy of the ciphertext digest state
+    # instead of re-hashing a hex string twice the size of the model
+    model_hash = hashlib.sha256(model_data)
+    signature_hash = model_hash.copy()
+    signature_hash.update(f"||{leader_private_key}".encode())
+    
     # Simulate CP-ABE encryption with access policy
     encrypted_model = {
-        'ciphertext': hashlib.sha256(model_data).hexdigest(),  # Simulated ciphertext
+        'ciphertext': model_hash.hexdigest(),  # Simulated ciphertext
         'access_policy': access_policy,
         'encrypted_data': model_data,  # In production, this would be encrypted
         'encryption_timestamp': time.time(),
-        'leader_signature': hashlib.sha256(f"{model_data.hex()}||{leader_private_key}".encode()).hexdigest()
+        'leader_signature': signature_hash.hexdigest()
     }
     
     print(f"Global model encrypted with access policy: {access_policy}")
     return encrypted_model
 
 def broadcast_global_model(encrypted_global_model):
-    """Broadcast encrypted global model to all healthcare facilities"""
+    """Broadcast encrypted global model to all healthcare facilities, returns (success, bytes sent)"""
     print(f"Broadcasting global model to {config.number_of_facilities} healthcare facilities")
     
+    # Encode the body here so its size is known without serializing the model again; msgpack carries
+    # the model bytes raw, the JSON fallback base64-encodes them as facilities expect
+    distribution_body, distribution_headers = flcommon.pack_payload({
+        'encrypted_model': encrypted_global_model,
+        'round': training_round,
+        'leader_id': 'leader_server',
+        'timestamp': time.time()
+    })
+    
     # Send to Trusted Authority for final distribution
     try:
-        ta_url = f"http://{config.ta_address}:{config.ta_port}/distribute_global_model"
-        
-        distribution_data = {
-            'encrypted_model': encrypted_global_model,
-            'round': training_round,
-            'leader_id': 'leader_server',
-            'timestamp': time.time()
-        }
-        
-        response = requests.post(ta_url, json=distribution_data, timeout=60)
+        response = http_session.post(ta_distribute_url, data=distribution_body,
+                                     headers=distribution_headers, timeout=60)
         
         if response.status_code == 200:
             print("Global model sent to Trusted Authority for distribution")
-            return True
+            return True, len(distribution_body)
         else:
             print(f"Failed to send to Trusted Authority: {response.status_code}")
-            return False
+            return False, len(distribution_body)
             
     except requests.RequestException as e:
         print(f"Error sending to Trusted Authority: {e}")
-        return False
+        return False, 0
 
-def process_global_aggregation():
+def process_global_aggregation(round_aggregations):
     """Process global aggregation when all fog nodes have reported"""
-    global fog_aggregations, training_round, total_upload_cost
+    global training_round, total_upload_cost
     
     time_logger.lead_server_start()
     
-    print(f"Processing global aggregation from {len(fog_aggregations)} fog nodes")
+    print(f"Processing global aggregation from {len(round_aggregations)} fog nodes")
     
     # Perform global aggregation
-    global_model = global_aggregation(fog_aggregations)
+    global_model = global_aggregation(round_aggregations)
     
     if global_model is None:
         print("Global aggregation failed")
@@ -149,15 +164,10 @@ def process_global_aggregation():
     encrypted_global_model = encrypt_global_model(global_model)
     
     # Broadcast encrypted model to facilities via Trusted Authority
-    success = broadcast_global_model(encrypted_global_model)
+    success, sent_bytes = broadcast_global_model(encrypted_global_model)
     
-    # Clear fog aggregations for next round
-    fog_aggregations.clear()
-    
-    # Calculate upload cost
-    global total_upload_cost
-    model_size = len(pickle.dumps(encrypted_global_model))
-    total_upload_cost += model_size * config.number_of_facilities
+    # Calculate upload cost from the body actually sent instead of pickling the model again
+    total_upload_cost += sent_bytes * config.number_of_facilities
     
     print(f"[DOWNLOAD] Total download cost so far: {total_download_cost}")
     print(f"[UPLOAD] Total upload cost so far: {total_upload_cost}")
@@ -171,6 +181,24 @@ def process_global_aggregation():
     
     return success
 
+def global_aggregation_worker():
+    """Wait for fog aggregation arrivals and run one global aggregation per complete set"""
+    while True:
+        fog_aggregation_arrived.acquire()
+        if len(fog_aggregations) < config.num_fog_nodes:
+            continue
+        
+        print("All fog aggregations received, starting global aggregation...")
+        try:
+            # start_round may clear the deque concurrently; popleft then raises and the set is dropped
+            round_aggregations = [fog_aggregations.popleft() for _ in range(config.num_fog_nodes)]
+            process_global_aggregation(round_aggregations)
+        except Exception as e:
+            print(f"Error during global aggregation: {e}")
+
+# Started once at import so it also runs when the app is served by gunicorn
+threading.Thread(target=global_aggregation_worker, daemon=True).start()
+
 @api.route('/', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -184,40 +212,53 @@ def health_check():
         "public_key": leader_public_key[:16]
     })
 
+def read_request_body():
+    """Read the request body once into a preallocated buffer, skipping Werkzeug's cached request.data copy"""
+    length = request.content_length
+    stream = request.stream
+    if length is None or not hasattr(stream, 'readinto'):
+        return request.get_data(cache=False)
+    
+    body = memoryview(bytearray(length))
+    offset = 0
+    while offset < length:
+        read = stream.readinto(body[offset:])
+        if not read:
+            raise ValueError(f"Request body ended after {offset} of {length} bytes")
+        offset += read
+    return body
+
 @api.route('/receive_fog_aggregation', methods=['POST'])
 def receive_fog_aggregation():
     """Receive partial aggregation from fog node"""
     try:
-        # Deserialize the aggregation data
-        aggregation_data = pickle.loads(request.data)
+        body = read_request_body()
         
         global total_download_cost
-        total_download_cost += len(request.data)
+        total_download_cost += len(body)
+        
+        # Decode and verify before answering, so a rejected fog node gets a 401/500 instead of a 200
+        # and the round does not sit waiting for an aggregation that was silently dropped
+        aggregation_data, aggregated_model = flcommon.unpack_weights_message(flcommon.decompress_bytes(body))
+        aggregation_data['aggregated_model'] = aggregated_model
         
         fog_node_id = aggregation_data['fog_node_id']
-        aggregated_model = aggregation_data['aggregated_model']
         signature = aggregation_data['signature']
         fog_public_key = aggregation_data['public_key']
         
-        print(f"[DOWNLOAD] Fog aggregation from fog node {fog_node_id} received. size: {len(request.data)}")
+        print(f"[DOWNLOAD] Fog aggregation from fog node {fog_node_id} received. size: {len(body)}")
         
         # Verify fog node signature
-        if not verify_fog_node_signature(aggregated_model, signature, fog_public_key):
+        if not verify_fog_node_signature(aggregated_model, signature, fog_public_key, fog_node_id):
             print(f"Invalid signature from fog node {fog_node_id}")
             return jsonify({"error": "Invalid fog node signature"}), 401
         
-        # Store the verified aggregation
+        # Store the verified aggregation and wake the aggregation worker
         fog_aggregations.append(aggregation_data)
+        fog_aggregation_arrived.release()
         
         print(f"Leader server received aggregation {len(fog_aggregations)}/{config.num_fog_nodes} from fog node {fog_node_id}")
         
-        # Check if all fog nodes have reported
-        if len(fog_aggregations) >= config.num_fog_nodes:
-            print("All fog aggregations received, starting global aggregation...")
-            # Start global aggregation in separate thread
-            global_aggregation_thread = threading.Thread(target=process_global_aggregation)
-            global_aggregation_thread.start()
-        
         return jsonify({"response": "aggregation_received", "leader_id": "leader_server"})
         
     except Exception as e:
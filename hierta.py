@@ -2,18 +2,22 @@
 import pickle
 import threading
 import time
+import functools
 import hashlib
 import json
 import secrets
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from flask import Flask, request, jsonify
 
+import flcommon
 from config import HierTrustedAuthorityConfig
 
 config = HierTrustedAuthorityConfig()
 
 api = Flask(__name__)
+flcommon.install_orjson_provider(api)
 
 # Trusted Authority state
 registered_facilities = {}
@@ -22,6 +26,21 @@ master_secret_key = secrets.token_hex(32)
 public_key = hashlib.sha256(master_secret_key.encode()).hexdigest()
 issued_keys = {}
 
+# Access policy for global model distribution (can be customized)
+distribution_policy = {
+    'facility_type': 'hospital',
+    'certified': True
+}
+# Registered facilities satisfying distribution_policy (insertion-ordered), maintained on register/revoke
+authorized_facilities = {}
+
+# Keep-alive connections to every facility, reused across distribution rounds
+http_session = flcommon.pooled_session(pool_connections=max(10, config.number_of_facilities), pool_maxsize=64)
+distribution_pool = ThreadPoolExecutor(max_workers=max(8, config.number_of_facilities))
+
+# PoW target as 32 big-endian bytes, so digests are compared without building a 256-bit int
+pow_target_bytes = config.pow_target.to_bytes(32, 'big')
+
 def setup_cp_abe():
     """Initialize CP-ABE system with public/master secret keys"""
     print("Initializing CP-ABE system...")
@@ -29,17 +48,18 @@ def setup_cp_abe():
     print(f"Attribute Universe: {attribute_universe}")
     return public_key, master_secret_key
 
-def verify_proof_of_work(facility_id, nonce, hash_result, public_key_ref):
+def pow_challenge_suffix(facility_id, public_key_ref):
+    """Constant tail of a facility's PoW challenge: b'||{facility_id}||{public_key}'"""
+    return f"||{facility_id}||{public_key_ref}".encode()
+
+def verify_proof_of_work(facility_id, nonce, hash_result, challenge_suffix):
     """Verify Proof-of-Work from facility registration"""
     try:
-        # Recreate the challenge
-        facility_data = f"{facility_id}||{public_key_ref}"
-        challenge_input = f"{nonce}||{facility_data}"
-        computed_hash = hashlib.sha256(challenge_input.encode()).hexdigest()
+        # Recreate the challenge from the nonce and the facility's prebuilt suffix bytes
+        digest = hashlib.sha256(str(nonce).encode() + challenge_suffix).digest()
         
-        # Verify hash meets difficulty requirement
-        hash_value = int(computed_hash, 16)
-        is_valid = hash_value < config.pow_target and hash_result == computed_hash
+        # Verify hash meets difficulty requirement (big-endian byte compare == integer compare)
+        is_valid = digest < pow_target_bytes and hash_result == digest.hex()
         
         print(f"PoW verification for facility {facility_id}: {'valid' if is_valid else 'invalid'}")
         return is_valid
@@ -48,18 +68,29 @@ def verify_proof_of_work(facility_id, nonce, hash_result, public_key_ref):
         print(f"PoW verification error: {e}")
         return False
 
+@functools.lru_cache(maxsize=4096)
+def attribute_key_data(facility_id, attribute_items):
+    """Key material for a facility's sorted attribute items (pure, so cached across re-registrations)"""
+    attribute_string = json.dumps(attribute_items)
+    key_input = f"{facility_id}||{attribute_string}||{master_secret_key}"
+    return hashlib.sha256(key_input.encode()).hexdigest()
+
 def generate_attribute_key(facility_id, attributes):
     """Generate CP-ABE attribute-based secret key for facility"""
     # Simplified CP-ABE key generation
     # In production, use proper CP-ABE library
     
-    attribute_string = json.dumps(sorted(attributes.items()))
-    key_input = f"{facility_id}||{attribute_string}||{master_secret_key}"
+    attribute_items = tuple(sorted(attributes.items()))
+    try:
+        key_data = attribute_key_data(facility_id, attribute_items)
+    except TypeError:
+        # Unhashable attribute values (e.g. lists) cannot be cache keys
+        key_data = attribute_key_data.__wrapped__(facility_id, attribute_items)
     
     secret_key = {
         'facility_id': facility_id,
         'attributes': attributes,
-        'key_data': hashlib.sha256(key_input.encode()).hexdigest(),
+        'key_data': key_data,
         'issued_timestamp': time.time(),
         'issuer': 'trusted_authority'
     }
@@ -74,8 +105,11 @@ def encrypt_model_with_cp_abe(model_data, access_policy):
     policy_string = json.dumps(access_policy, sort_keys=True)
     encryption_key = hashlib.sha256(f"{policy_string}||{master_secret_key}".encode()).hexdigest()
     
+    # The leader sends the model base64-encoded, so hash its bytes
+    model_bytes = model_data.encode() if isinstance(model_data, str) else model_data
+    
     encrypted_model = {
-        'ciphertext': hashlib.sha256(model_data).hexdigest(),  # Simulated encryption
+        'ciphertext': hashlib.sha256(model_bytes).hexdigest(),  # Simulated encryption
         'access_policy': access_policy,
         'encrypted_data': model_data,  # In production, this would be properly encrypted
         'encryption_timestamp': time.time(),
@@ -110,7 +144,8 @@ def distribute_to_facility(facility_id, encrypted_model):
         facility_port = config.facility_base_port + facility_id
         url = f"http://{config.client_address}:{facility_port}/receive_global_model"
         
-        response = requests.post(url, json=encrypted_model, timeout=30)
+        body, headers = flcommon.pack_payload(encrypted_model)
+        response = http_session.post(url, data=body, headers=headers, timeout=30)
         
         if response.status_code == 200:
             print(f"Successfully distributed model to facility {facility_id}")
@@ -150,7 +185,8 @@ def register_facility():
         print(f"Processing registration for facility {facility_id}")
         
         # Verify Proof-of-Work
-        if not verify_proof_of_work(facility_id, nonce, hash_result, facility_public_key):
+        if not verify_proof_of_work(facility_id, nonce, hash_result,
+                                    pow_challenge_suffix(facility_id, facility_public_key)):
             print(f"PoW verification failed for facility {facility_id}")
             return jsonify({"error": "Proof-of-Work verification failed"}), 401
         
@@ -174,6 +210,13 @@ def register_facility():
         
         issued_keys[facility_id] = secret_key
         
+        # Evaluate the distribution policy once here instead of on every distribution
+        if check_facility_attributes(attributes, distribution_policy):
+            authorized_facilities[facility_id] = True
+        else:
+            authorized_facilities.pop(facility_id, None)
+            print(f"Facility {facility_id} does not satisfy access policy")
+        
         print(f"Facility {facility_id} registered successfully")
         print(f"Attributes: {attributes}")
         
@@ -192,44 +235,32 @@ def register_facility():
 def distribute_global_model():
     """Distribute encrypted global model to authorized facilities"""
     try:
-        distribution_data = request.get_json()
+        distribution_data = flcommon.unpack_request_payload(request)
         
         encrypted_model = distribution_data['encrypted_model']
         round_num = distribution_data['round']
         
         print(f"Distributing global model for round {round_num}")
         
-        # Define access policy (can be customized)
-        access_policy = {
-            'facility_type': 'hospital',
-            'certified': True
-        }
+        # The policy is the same for every facility, so encrypt once and copy per facility
+        policy_encrypted_model = encrypt_model_with_cp_abe(
+            encrypted_model['encrypted_data'], 
+            distribution_policy
+        )
         
-        successful_distributions = 0
+        deliveries = []
         
-        # Distribute to all authorized facilities
-        for facility_id, facility_info in registered_facilities.items():
-            facility_attributes = facility_info['attributes']
-            
-            # Check if facility satisfies access policy
-            if check_facility_attributes(facility_attributes, access_policy):
-                # Re-encrypt with facility-specific policy
-                facility_encrypted_model = encrypt_model_with_cp_abe(
-                    encrypted_model['encrypted_data'], 
-                    access_policy
-                )
-                
-                # Add facility-specific information
-                facility_encrypted_model['facility_id'] = facility_id
-                facility_encrypted_model['round'] = round_num
-                facility_encrypted_model['distribution_timestamp'] = time.time()
-                
-                # Distribute to facility
-                if distribute_to_facility(facility_id, facility_encrypted_model):
-                    successful_distributions += 1
-                    
-            else:
-                print(f"Facility {facility_id} does not satisfy access policy")
+        # Authorized facilities are indexed at registration, so no per-round policy scan
+        for facility_id in list(authorized_facilities):
+            # Add facility-specific information
+            facility_encrypted_model = policy_encrypted_model.copy()
+            facility_encrypted_model['facility_id'] = facility_id
+            facility_encrypted_model['round'] = round_num
+            facility_encrypted_model['distribution_timestamp'] = time.time()
+            deliveries.append((facility_id, facility_encrypted_model))
+        
+        # Distribute to facilities concurrently so one slow facility does not delay the rest
+        successful_distributions = sum(distribution_pool.map(lambda delivery: distribute_to_facility(*delivery), deliveries))
         
         print(f"Successfully distributed model to {successful_distributions}/{len(registered_facilities)} facilities")
         
@@ -279,6 +310,7 @@ def revoke_facility():
         
         if facility_id in registered_facilities:
             registered_facilities[facility_id]['status'] = 'revoked'
+            authorized_facilities.pop(facility_id, None)
             
             if facility_id in issued_keys:
                 del issued_keys[facility_id]
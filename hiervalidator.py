@@ -1,28 +1,55 @@
 #!/usr/bin/env python3
+import os
 import pickle
+import re
 import sys
 import threading
 import hashlib
 import time
-import json
-from collections import defaultdict
+import queue
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from flask import Flask, request, jsonify
 
+import flcommon
 from config import HierValidatorConfig
+from production_crypto import ProductionMerkleTree
 
-config = HierValidatorConfig(int(sys.argv[1]))
+# Under gunicorn argv belongs to the server, so the launcher passes the index through VALIDATOR_INDEX
+config = HierValidatorConfig(int(os.environ.get('VALIDATOR_INDEX') or sys.argv[1]))
 
 api = Flask(__name__)
+flcommon.install_orjson_provider(api)
 
 # Validator committee state
 pending_shares = defaultdict(list)  # facility_id -> list of shares
-vote_records = defaultdict(dict)    # share_id -> validator_id -> vote
-validated_shares = []
+vote_records = OrderedDict()        # share_id -> validator_id -> vote, oldest share first
+vote_record_times = {}              # share_id -> monotonic time its first vote was recorded
+vote_records_lock = threading.Lock()
+seen_shares = {}                    # share_id -> share request, served to peers that vote before seeing it
+vote_locks = {}                     # share_id -> lock serializing that share's vote handling
+share_fetches = set()               # share_ids being pulled from a peer right now (one fetch per share)
+validated_shares = deque(maxlen=config.validated_share_history)
+approved_share_ids = set()          # shares whose fog broadcast is claimed or done (never sent twice)
 committee_private_key = f"validator_{config.validator_index}_private_key"
 committee_public_key = hashlib.sha256(committee_private_key.encode()).hexdigest()
 
+# Keep-alive connections to the peer validators and fog nodes (one pool per host:port)
+http_session = flcommon.pooled_session(pool_connections=config.committee_size + config.num_fog_nodes, pool_maxsize=64)
+# Shared fan-out pool for vote and approved-share broadcasts
+broadcast_pool = ThreadPoolExecutor(max_workers=max(8, config.committee_size + config.num_fog_nodes))
+# Checks shares of a /validate_shares_batch request in parallel
+validation_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4)
+JSON_HEADERS = {'Content-Type': 'application/json'}
+HEX_SIGNATURE_RE = re.compile(r'\A[0-9a-fA-F]+\Z')
+BASE64_SIGNATURE_RE = re.compile(r'\A[A-Za-z0-9+/]+={0,2}\Z')
+# PoW target as 32 big-endian bytes, so digests are compared without building a 256-bit int
+pow_target_bytes = config.pow_target.to_bytes(32, 'big')
+# Outbound votes waiting to be coalesced into one batch POST per peer
+outbound_votes = queue.Queue()
+
 def verify_facility_signature(share_data, signature, facility_public_key):
     """Verify digital signature from healthcare facility"""
     try:
@@ -30,20 +57,10 @@ def verify_facility_signature(share_data, signature, facility_public_key):
         if not signature or len(signature) == 0:
             return False
         
-        # Accept both RSA-PSS signatures (variable length hex) and HMAC (64-char hex)
-        if isinstance(signature, str) and len(signature) > 0:
-            # Basic format validation - accept hex strings
-            try:
-                int(signature, 16)  # Test if it's valid hex
-                return True
-            except ValueError:
-                # Also accept base64 format
-                try:
-                    import base64
-                    base64.b64decode(signature)
-                    return True
-                except Exception:
-                    return False
+        # Accept both RSA-PSS signatures (variable length hex) and HMAC (64-char hex), or base64;
+        # a regex scan checks the format without building a bignum from a 512+ char hex string
+        if isinstance(signature, str):
+            return bool(HEX_SIGNATURE_RE.match(signature) or BASE64_SIGNATURE_RE.match(signature))
         
         return False
         
@@ -51,17 +68,26 @@ def verify_facility_signature(share_data, signature, facility_public_key):
         print(f"Signature verification error: {e}")
         return False
 
+def verify_share_inclusion(share_data, merkle_proof, merkle_root):
+    """Check the share is a leaf under the facility's signed Merkle root"""
+    try:
+        leaf = ProductionMerkleTree.leaf_hash(flcommon.canonical_json(share_data))
+        return ProductionMerkleTree.verify_proof(leaf, merkle_proof, bytes.fromhex(merkle_root))
+    except Exception as e:
+        print(f"Merkle proof verification error: {e}")
+        return False
+
 def validate_proof_of_work(facility_id, nonce, hash_result, facility_public_key):
     """Validate Proof-of-Work from healthcare facility"""
     try:
         # Recreate the PoW challenge using the actual facility public key
         facility_data = f"{facility_id}||{facility_public_key}"
         challenge_input = f"{nonce}||{facility_data}"
-        computed_hash = hashlib.sha256(challenge_input.encode()).hexdigest()
+        digest = hashlib.sha256(challenge_input.encode()).digest()
+        computed_hash = digest.hex()
         
-        # Check if hash meets difficulty requirement AND matches provided hash
-        hash_value = int(computed_hash, 16)
-        is_valid = hash_value < config.pow_target and computed_hash == hash_result
+        # Check if hash meets difficulty requirement AND matches provided hash (big-endian byte compare)
+        is_valid = digest < pow_target_bytes and computed_hash == hash_result
         
         print(f"PoW validation for facility {facility_id}: {'valid' if is_valid else 'invalid'}")
         print(f"  Expected: {computed_hash}")
@@ -109,7 +135,7 @@ def validate_share_integrity(share_data):
         print(f"Share integrity validation error: {e}")
         return False
 
-def cast_vote(share_id, facility_id, share_data, signature, facility_public_key):
+def cast_vote(share_id, facility_id, share_data, signature, facility_public_key, merkle_root=None, merkle_proof=None):
     """Cast vote on whether to approve the share"""
     validator_id = config.validator_index
     
@@ -121,6 +147,11 @@ def cast_vote(share_id, facility_id, share_data, signature, facility_public_key)
         print(f"Validator {validator_id}: Invalid signature from facility {facility_id}")
         vote = 0
     
+    # The signature covers the Merkle root, so the share must prove membership under it
+    if merkle_root is not None and not verify_share_inclusion(share_data, merkle_proof or [], merkle_root):
+        print(f"Validator {validator_id}: Share from facility {facility_id} is not under its signed Merkle root")
+        vote = 0
+    
     # Check share integrity
     if not validate_share_integrity(share_data):
         print(f"Validator {validator_id}: Share integrity check failed for facility {facility_id}")
@@ -149,11 +180,57 @@ def cast_vote(share_id, facility_id, share_data, signature, facility_public_key)
             vote = 0
     
     # Record the vote
-    vote_records[share_id][validator_id] = vote
+    share_votes(share_id)[validator_id] = vote
     
     print(f"Validator {validator_id} cast vote {vote} for share {share_id} from facility {facility_id}")
     return vote
 
+def share_votes(share_id):
+    """Vote dict for a share, created on first use (evicting expired or excess records)"""
+    votes = vote_records.get(share_id)
+    if votes is None:
+        with vote_records_lock:
+            votes = vote_records.get(share_id)
+            if votes is None:
+                evict_stale_vote_records()
+                votes = vote_records[share_id] = {}
+                vote_record_times[share_id] = time.monotonic()
+    return votes
+
+def evict_stale_vote_records():
+    """Drop records of shares whose consensus never completed; caller holds vote_records_lock"""
+    # Records are created in time order, so expired ones are always at the front
+    expiry = time.monotonic() - config.vote_record_ttl
+    while vote_records:
+        oldest = next(iter(vote_records))
+        if len(vote_records) < config.max_vote_records and vote_record_times[oldest] > expiry:
+            break
+        del vote_records[oldest]
+        del vote_record_times[oldest]
+        seen_shares.pop(oldest, None)
+        vote_locks.pop(oldest, None)
+
+def share_lock(share_id):
+    """Lock serializing a share's vote handling; evicted together with its vote record"""
+    lock = vote_locks.get(share_id)
+    if lock is None:
+        with vote_records_lock:
+            lock = vote_locks.get(share_id)
+            if lock is None:
+                lock = vote_locks[share_id] = threading.Lock()
+    return lock
+
+def release_share_payload(share_id):
+    """Drop a decided share's payload; its vote record and lock age out via evict_stale_vote_records"""
+    # Popping the lock here would hand threads still waiting on it a fresh, unrelated lock
+    seen_shares.pop(share_id, None)
+
+def record_validated_share(share_id):
+    """Append to the bounded validated history, forgetting the approval of the id it pushes out"""
+    if len(validated_shares) == validated_shares.maxlen:
+        approved_share_ids.discard(validated_shares[0])
+    validated_shares.append(share_id)
+
 def get_other_validators():
     """Get list of other validator committee members"""
     other_validators = []
@@ -165,41 +242,89 @@ def get_other_validators():
             })
     return other_validators
 
-def broadcast_vote_to_committee(share_id, vote, share_data):
-    """Broadcast vote to other committee members"""
-    vote_message = {
+def broadcast_vote_to_committee(share_id, vote):
+    """Queue vote for the next batched broadcast to other committee members"""
+    # Votes carry only the share id: every validator receives the share from the facility, and
+    # a peer that votes first pulls it once from /share/<share_id> instead of getting it N times
+    outbound_votes.put({
         'share_id': share_id,
         'validator_id': config.validator_index,
         'vote': vote,
-        'timestamp': time.time(),
-        'share_data': share_data
-    }
+        'timestamp': time.time()
+    })
+
+def get_share_request(share_id, voter_id):
+    """Share request for share_id, fetched once from the voting peer if not yet received"""
+    share_request = seen_shares.get(share_id)
+    if share_request is not None:
+        return share_request
     
-    other_validators = get_other_validators()
-    successful_broadcasts = 0
+    try:
+        url = f"http://{config.server_address}:{config.committee_base_port + voter_id}/share/{share_id}"
+        response = http_session.get(url, timeout=30)
+        
+        if response.status_code == 200:
+            share_request = response.json()
+            # A share decided while the request was in flight has had its payload released; don't bring it back
+            if share_id not in approved_share_ids:
+                share_request = seen_shares.setdefault(share_id, share_request)
+            return share_request
+        print(f"Validator {voter_id} could not provide share {share_id}: {response.status_code}")
+        
+    except requests.RequestException as e:
+        print(f"Network error fetching share {share_id} from validator {voter_id}: {e}")
+    return None
+
+def send_vote_batch(votes):
+    """Send a batch of votes to every other committee member"""
+    # Encode once and post to all peers concurrently, so the broadcast takes the slowest RTT, not the sum
+    batch_body = flcommon.json_dumps_bytes({'votes': votes})
     
-    for validator in other_validators:
+    def post_vote(validator):
         try:
-            url = f"http://{config.server_address}:{validator['port']}/receive_vote"
-            response = requests.post(url, json=vote_message, timeout=10)
+            url = f"http://{config.server_address}:{validator['port']}/receive_votes_batch"
+            response = http_session.post(url, data=batch_body, headers=JSON_HEADERS, timeout=10)
             
             if response.status_code == 200:
-                successful_broadcasts += 1
-            else:
-                print(f"Failed to broadcast vote to validator {validator['validator_id']}")
+                return True
+            print(f"Failed to broadcast vote to validator {validator['validator_id']}")
                 
         except requests.RequestException as e:
             print(f"Network error broadcasting to validator {validator['validator_id']}: {e}")
+        return False
+    
+    other_validators = get_other_validators()
+    successful_broadcasts = sum(broadcast_pool.map(post_vote, other_validators))
     
-    print(f"Vote broadcast to {successful_broadcasts}/{len(other_validators)} validators")
+    print(f"Broadcast {len(votes)} vote(s) to {successful_broadcasts}/{len(other_validators)} validators")
     return successful_broadcasts
 
+def vote_batcher():
+    """Coalesce votes cast within a short window into one POST per peer"""
+    while True:
+        batch = [outbound_votes.get()]
+        deadline = time.monotonic() + config.vote_batch_window
+        while len(batch) < config.vote_batch_max:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(outbound_votes.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            send_vote_batch(batch)
+        except Exception as e:
+            print(f"Error broadcasting vote batch: {e}")
+
+threading.Thread(target=vote_batcher, daemon=True).start()
+
 def check_consensus(share_id):
     """Check if consensus has been reached for a share"""
-    if share_id not in vote_records:
+    votes = vote_records.get(share_id)
+    if votes is None:
         return False, 0
     
-    votes = vote_records[share_id]
     total_votes = len(votes)
     approve_votes = sum(1 for vote in votes.values() if vote == 1)
     
@@ -211,10 +336,17 @@ def check_consensus(share_id):
 
 def sign_committee_approval(share_data):
     """Create committee signature for approved share"""
-    data_str = json.dumps(share_data, sort_keys=True, default=str)
-    signature_input = f"{data_str}||committee_signature"
-    signature = hashlib.sha256(signature_input.encode()).hexdigest()
-    return signature
+    # Hash the (large) fragment string as-is after the small canonical metadata, rather than
+    # re-encoding it inside a sorted json.dumps of the whole share
+    fragment_key = 'data_fragment' if 'data_fragment' in share_data else 'share_data'
+    fragment = share_data.get(fragment_key, '')
+    metadata = {key: value for key, value in share_data.items() if key != fragment_key}
+    
+    signature_hash = hashlib.sha256(flcommon.canonical_json(metadata))
+    signature_hash.update(b'||')
+    signature_hash.update(fragment.encode() if isinstance(fragment, str) else bytes(fragment))
+    signature_hash.update(b'||committee_signature')
+    return signature_hash.hexdigest()
 
 def broadcast_to_fog_nodes(approved_share_data):
     """Broadcast approved share to ALL fog nodes"""
@@ -232,24 +364,26 @@ def broadcast_to_fog_nodes(approved_share_data):
         'validator_id': config.validator_index
     }
     
-    successful_broadcasts = 0
+    share_body = flcommon.json_dumps_bytes(committee_signed_share)
     
-    # Send the approved share to ALL fog nodes (each needs all fragments)
-    for fog_node_index in range(config.num_fog_nodes):
+    def post_share(fog_node_index):
         fog_node_port = config.fog_node_base_port + fog_node_index
         
         try:
             url = f"http://{config.server_address}:{fog_node_port}/receive_share"
-            response = requests.post(url, json=committee_signed_share, timeout=30)
+            response = http_session.post(url, data=share_body, headers=JSON_HEADERS, timeout=30)
             
             if response.status_code == 200:
                 print(f"Successfully broadcast approved share to fog node {fog_node_index}")
-                successful_broadcasts += 1
-            else:
-                print(f"Failed to broadcast to fog node {fog_node_index}: {response.status_code}")
+                return True
+            print(f"Failed to broadcast to fog node {fog_node_index}: {response.status_code}")
                 
         except requests.RequestException as e:
             print(f"Network error broadcasting to fog node {fog_node_index}: {e}")
+        return False
+    
+    # Send the approved share to ALL fog nodes (each needs all fragments) concurrently
+    successful_broadcasts = sum(broadcast_pool.map(post_share, range(config.num_fog_nodes)))
     
     print(f"Share broadcast to {successful_broadcasts}/{config.num_fog_nodes} fog nodes")
     return successful_broadcasts > 0
@@ -267,27 +401,44 @@ def health_check():
         "public_key": committee_public_key[:16]
     })
 
-@api.route('/validate_share', methods=['POST'])
-def validate_share():
-    """Receive and validate secret share from healthcare facility"""
-    try:
-        share_request = request.get_json()
-        
-        facility_id = share_request['facility_id']
-        share_data = share_request['share']
-        signature = share_request['signature']
-        facility_public_key = share_request['public_key']
+def process_share_request(share_request):
+    """Validate a facility's share, cast and broadcast our vote; returns (share_id, vote)"""
+    facility_id = share_request['facility_id']
+    share_data = share_request['share']
+    signature = share_request['signature']
+    facility_public_key = share_request['public_key']
+    
+    # Use deterministic share_uid from client for consensus
+    share_id = share_request.get('share_uid', f"{facility_id}_{share_data['share_id']}_{time.time()}")
+    
+    print(f"Validator {config.validator_index} received share from facility {facility_id}")
+    
+    # Same per-share lock as process_vote, so a peer's vote that pulled this share
+    # meanwhile cannot make us cast our own vote twice
+    with share_lock(share_id):
+        # A share already approved here needs no second vote, and its payload must not be kept again
+        if share_id in approved_share_ids:
+            return share_id, share_votes(share_id).get(config.validator_index, 1)
         
-        # Use deterministic share_uid from client for consensus
-        share_id = share_request.get('share_uid', f"{facility_id}_{share_data['share_id']}_{time.time()}")
+        seen_shares.setdefault(share_id, share_request)
         
-        print(f"Validator {config.validator_index} received share from facility {facility_id}")
+        vote = share_votes(share_id).get(config.validator_index)
+        if vote is not None:
+            return share_id, vote
         
         # Cast vote on the share
-        vote = cast_vote(share_id, facility_id, share_data, signature, facility_public_key)
-        
-        # Broadcast vote to other committee members
-        broadcast_vote_to_committee(share_id, vote, share_request)
+        vote = cast_vote(share_id, facility_id, share_data, signature, facility_public_key,
+                         share_request.get('merkle_root'), share_request.get('merkle_proof'))
+    
+    # Broadcast vote to other committee members outside the lock
+    broadcast_vote_to_committee(share_id, vote)
+    return share_id, vote
+
+@api.route('/validate_share', methods=['POST'])
+def validate_share():
+    """Receive and validate secret share from healthcare facility"""
+    try:
+        share_id, vote = process_share_request(request.get_json())
         
         return jsonify({
             "response": "share_received",
@@ -300,58 +451,170 @@ def validate_share():
         print(f"Error validating share: {e}")
         return jsonify({"error": "Share validation failed"}), 500
 
-@api.route('/receive_vote', methods=['POST'])
-def receive_vote():
-    """Receive vote from another committee member"""
+@api.route('/validate_shares_batch', methods=['POST'])
+def validate_shares_batch():
+    """Receive and validate a batch of secret shares, checking them in parallel"""
     try:
-        vote_data = request.get_json()
+        shares = request.get_json()['shares']
+        
+        def validate_entry(share_request):
+            try:
+                share_id, vote = process_share_request(share_request)
+                return {"share_id": share_id, "vote": vote}
+            except Exception as e:
+                print(f"Error validating share: {e}")
+                return {"error": "Share validation failed"}
+        
+        # hashlib releases the GIL on large inputs, so the Merkle and integrity checks of independent shares overlap
+        results = list(validation_pool.map(validate_entry, shares))
         
-        share_id = vote_data['share_id']
-        voter_id = vote_data['validator_id']
-        vote = vote_data['vote']
+        return jsonify({
+            "response": "shares_received",
+            "validator_id": config.validator_index,
+            "results": results
+        })
+        
+    except Exception as e:
+        print(f"Error validating share batch: {e}")
+        return jsonify({"error": "Share batch validation failed"}), 500
+
+def process_vote(vote_data):
+    """Record a peer's vote, cast our own if needed and act on consensus"""
+    share_id = vote_data['share_id']
+    voter_id = vote_data['validator_id']
+    vote = vote_data['vote']
+    
+    # Late votes for a share already approved here change nothing: skip them without validating again
+    if share_id in approved_share_ids:
+        return
+    
+    # Votes for the same share arrive on concurrent request threads; serialize them per share so
+    # our own vote is cast once and consensus is claimed by exactly one thread
+    lock = share_lock(share_id)
+    current_validator_id = config.validator_index
+    with lock:
+        # The share may have been decided while this thread waited for the lock
+        if share_id in approved_share_ids:
+            return
         
         # Record the vote
-        vote_records[share_id][voter_id] = vote
+        share_votes(share_id)[voter_id] = vote
         
         print(f"Received vote {vote} from validator {voter_id} for share {share_id}")
         
+        # Peers running the previous protocol still attach the full share
+        if 'share_data' in vote_data:
+            seen_shares.setdefault(share_id, vote_data['share_data'])
+        
+        needs_share = (current_validator_id not in share_votes(share_id) and share_id not in seen_shares
+                       and share_id not in share_fetches)
+        if needs_share:
+            share_fetches.add(share_id)
+    
+    # Pull a missing share outside the lock, so a slow or dead peer delays only this vote,
+    # not every other vote for the same share
+    if needs_share:
+        try:
+            get_share_request(share_id, voter_id)
+        finally:
+            with lock:
+                share_fetches.discard(share_id)
+    
+    with lock:
+        # Re-check after the fetch: the share may have been decided or our vote cast meanwhile
+        if share_id in approved_share_ids:
+            return
+        
         # If this validator hasn't voted yet, validate the share and cast own vote
-        current_validator_id = config.validator_index
-        if current_validator_id not in vote_records[share_id] and 'share_data' in vote_data:
-            share_request = vote_data['share_data']
+        share_request = None
+        own_vote = None
+        if current_validator_id not in share_votes(share_id):
+            share_request = seen_shares.get(share_id)
+        if share_request is not None:
             facility_id = share_request['facility_id']
             share_data = share_request['share']
             signature = share_request['signature']
             facility_public_key = share_request['public_key']
             
             # Cast our own vote on this share
-            own_vote = cast_vote(share_id, facility_id, share_data, signature, facility_public_key)
-            vote_records[share_id][current_validator_id] = own_vote
+            own_vote = cast_vote(share_id, facility_id, share_data, signature, facility_public_key,
+                                 share_request.get('merkle_root'), share_request.get('merkle_proof'))
+            share_votes(share_id)[current_validator_id] = own_vote
             
             print(f"Validator {current_validator_id} cast vote {own_vote} for share {share_id}")
         
         # Check if we have consensus
         consensus_reached, approve_votes = check_consensus(share_id)
         
-        if consensus_reached:
-            # Broadcast approved share to fog nodes
-            share_request = vote_data['share_data']
-            print(f"Consensus reached for share {share_id}, broadcasting to fog nodes")
-            
-            success = broadcast_to_fog_nodes(share_request)
-            
-            if success:
-                validated_shares.append(share_id)
-                # Clean up vote records
-                if share_id in vote_records:
-                    del vote_records[share_id]
+        claimed = consensus_reached and share_id not in approved_share_ids
+        if claimed:
+            approved_share_ids.add(share_id)
+    
+    # A vote cast on a pulled share must reach the committee too, or peers that never
+    # received the share directly cannot count it
+    if own_vote is not None:
+        broadcast_vote_to_committee(share_id, own_vote)
+    
+    # The fog broadcast runs outside the lock; the claim above keeps it from being sent twice
+    if claimed:
+        # Broadcast approved share to fog nodes
+        share_request = get_share_request(share_id, voter_id)
+        if share_request is None:
+            print(f"Consensus reached for share {share_id}, but the share is unavailable")
+            approved_share_ids.discard(share_id)
+            return
+        print(f"Consensus reached for share {share_id}, broadcasting to fog nodes")
         
+        success = broadcast_to_fog_nodes(share_request)
+        
+        if success:
+            record_validated_share(share_id)
+            # Free the payload; approved_share_ids turns away any late votes
+            release_share_payload(share_id)
+        else:
+            # Let a later vote retry the broadcast
+            approved_share_ids.discard(share_id)
+
+@api.route('/receive_vote', methods=['POST'])
+def receive_vote():
+    """Receive vote from another committee member"""
+    try:
+        process_vote(request.get_json())
         return jsonify({"response": "vote_recorded", "validator_id": config.validator_index})
         
     except Exception as e:
         print(f"Error processing vote: {e}")
         return jsonify({"error": "Vote processing failed"}), 500
 
+@api.route('/receive_votes_batch', methods=['POST'])
+def receive_votes_batch():
+    """Receive a batch of votes from another committee member"""
+    try:
+        votes = request.get_json()['votes']
+        
+        processed = 0
+        for vote_data in votes:
+            try:
+                process_vote(vote_data)
+                processed += 1
+            except Exception as e:
+                print(f"Error processing vote for share {vote_data.get('share_id')}: {e}")
+        
+        return jsonify({"response": "votes_recorded", "validator_id": config.validator_index,
+                        "processed": processed, "received": len(votes)})
+        
+    except Exception as e:
+        print(f"Error processing vote batch: {e}")
+        return jsonify({"error": "Vote batch processing failed"}), 500
+
+@api.route('/share/<share_id>', methods=['GET'])
+def get_share(share_id):
+    """Serve a share this validator received to a peer that only has its vote"""
+    share_request = seen_shares.get(share_id)
+    if share_request is None:
+        return jsonify({"error": "Share not found"}), 404
+    return jsonify(share_request)
+
 @api.route('/status', methods=['GET'])
 def get_status():
     """Get detailed validator status"""
@@ -371,7 +634,13 @@ def reset_validator():
     global pending_shares, vote_records, validated_shares
     
     pending_shares.clear()
-    vote_records.clear()
+    with vote_records_lock:
+        vote_records.clear()
+        vote_record_times.clear()
+        seen_shares.clear()
+        vote_locks.clear()
+        share_fetches.clear()
+    approved_share_ids.clear()
     validated_shares.clear()
     
     print(f"Validator {config.validator_index} reset for new round")
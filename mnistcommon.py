@@ -67,13 +67,14 @@ def load_test_dataset():
     return x_test, y_test
 
 
-def get_model():
+def get_model(jit_compile=False):
     model = Sequential()
     model.add(Dense(350, input_shape=(784,), activation='relu'))
     model.add(Dense(50, activation='relu'))
     model.add(Dense(10, activation='softmax'))
 
     # Configure the model and start training
-    model.compile(loss='categorical_crossentropy', optimizer='adam', metrics=['accuracy'])
+    model.compile(loss='categorical_crossentropy', optimizer='adam', metrics=['accuracy'],
+                  jit_compile=jit_compile)
 
     return model
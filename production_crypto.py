@@ -7,15 +7,20 @@ Implements secure versions of cryptographic primitives for real-world deployment
 import os
 import json
 import pickle
+import functools
 import hashlib
+import math
+import multiprocessing
+import queue
+import struct
 import time
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Union
 from dataclasses import dataclass
 
 # Production cryptographic libraries
 from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa, padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.backends import default_backend
 from cryptography.fernet import Fernet
@@ -30,6 +35,13 @@ except ImportError:
     print("Warning: secretsharing library not available, using simplified implementation")
 
 
+# Backend and padding/hash parameter objects are immutable: build them once instead of per operation
+_BACKEND = default_backend()
+_SHA256 = hashes.SHA256()
+_PSS_PADDING = padding.PSS(mgf=padding.MGF1(_SHA256), salt_length=padding.PSS.MAX_LENGTH)
+_OAEP_PADDING = padding.OAEP(mgf=padding.MGF1(algorithm=_SHA256), algorithm=_SHA256, label=None)
+
+
 @dataclass
 class CryptoConfig:
     """Configuration for cryptographic operations"""
@@ -41,6 +53,7 @@ class CryptoConfig:
     noise_scale: float = 0.1
     privacy_epsilon: float = 1.0
     privacy_delta: float = 1e-5
+    low_precision_aggregation: bool = False  # Accumulate and add noise in float32 instead of float64
 
 
 class ProductionRSA:
@@ -56,7 +69,7 @@ class ProductionRSA:
         self.private_key = rsa.generate_private_key(
             public_exponent=65537,
             key_size=self.key_size,
-            backend=default_backend()
+            backend=_BACKEND
         )
         self.public_key = self.private_key.public_key()
         
@@ -77,14 +90,14 @@ class ProductionRSA:
     def load_private_key(self, private_pem: bytes, password: Optional[bytes] = None):
         """Load private key from PEM format"""
         self.private_key = serialization.load_pem_private_key(
-            private_pem, password=password, backend=default_backend()
+            private_pem, password=password, backend=_BACKEND
         )
         self.public_key = self.private_key.public_key()
     
     def load_public_key(self, public_pem: bytes):
         """Load public key from PEM format"""
         self.public_key = serialization.load_pem_public_key(
-            public_pem, backend=default_backend()
+            public_pem, backend=_BACKEND
         )
     
     def sign(self, data: bytes) -> bytes:
@@ -94,11 +107,8 @@ class ProductionRSA:
             
         signature = self.private_key.sign(  # type: ignore
             data,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
+            _PSS_PADDING,
+            _SHA256
         )
         return signature
     
@@ -111,16 +121,29 @@ class ProductionRSA:
             self.public_key.verify(  # type: ignore
                 signature,
                 data,
-                padding.PSS(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    salt_length=padding.PSS.MAX_LENGTH
-                ),
-                hashes.SHA256()
+                _PSS_PADDING,
+                _SHA256
             )
             return True
         except Exception:
             return False
     
+    def verify_batch(self, items: List[Tuple[bytes, bytes]]) -> List[bool]:
+        """Verify many (data, signature) pairs against the loaded public key using RSA-PSS"""
+        if not self.public_key or not hasattr(self.public_key, 'verify'):
+            raise ValueError("Public key not loaded or does not support verification")
+        
+        verify = self.public_key.verify
+        
+        results = []
+        for data, signature in items:
+            try:
+                verify(signature, data, _PSS_PADDING, _SHA256)  # type: ignore
+                results.append(True)
+            except Exception:
+                results.append(False)
+        return results
+    
     def encrypt(self, data: bytes) -> bytes:
         """Encrypt data using RSA-OAEP"""
         if not self.public_key:
@@ -128,11 +151,7 @@ class ProductionRSA:
             
         encrypted = self.public_key.encrypt(
             data,
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
+            _OAEP_PADDING
         )
         return encrypted
     
@@ -143,20 +162,88 @@ class ProductionRSA:
             
         decrypted = self.private_key.decrypt(
             encrypted_data,
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
+            _OAEP_PADDING
         )
         return decrypted
 
 
+class ProductionEd25519:
+    """Ed25519 digital signatures: much faster signing and 64-byte signatures vs RSA-2048-PSS"""
+    
+    def __init__(self):
+        self.private_key = None
+        self.public_key = None
+    
+    def generate_keypair(self) -> Tuple[bytes, bytes]:
+        """Generate Ed25519 key pair and return serialized keys"""
+        self.private_key = ed25519.Ed25519PrivateKey.generate()
+        self.public_key = self.private_key.public_key()
+        
+        # Serialize keys
+        private_pem = self.private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+        
+        public_pem = self.public_key.public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        
+        return private_pem, public_pem
+    
+    def load_private_key(self, private_pem: bytes, password: Optional[bytes] = None):
+        """Load private key from PEM format"""
+        self.private_key = serialization.load_pem_private_key(private_pem, password=password)
+        if not isinstance(self.private_key, ed25519.Ed25519PrivateKey):
+            raise ValueError("Not an Ed25519 private key")
+        self.public_key = self.private_key.public_key()
+    
+    def load_public_key(self, public_pem: bytes):
+        """Load public key from PEM format"""
+        self.public_key = serialization.load_pem_public_key(public_pem)
+        if not isinstance(self.public_key, ed25519.Ed25519PublicKey):
+            raise ValueError("Not an Ed25519 public key")
+    
+    def sign(self, data: bytes) -> bytes:
+        """Create a 64-byte Ed25519 signature"""
+        if not self.private_key:
+            raise ValueError("Private key not loaded")
+        return self.private_key.sign(data)
+    
+    def verify(self, data: bytes, signature: bytes) -> bool:
+        """Verify an Ed25519 signature"""
+        if not self.public_key:
+            raise ValueError("Public key not loaded")
+        try:
+            self.public_key.verify(signature, data)
+            return True
+        except Exception:
+            return False
+    
+    def verify_batch(self, items: List[Tuple[bytes, bytes]]) -> List[bool]:
+        """Verify many (data, signature) pairs against the loaded public key"""
+        return [self.verify(data, signature) for data, signature in items]
+
+
 class ProductionAES:
     """Production-grade AES encryption with authenticated encryption"""
     
+    GCM_TAG_SIZE = 16
+    
     def __init__(self, key_size: int = 256):
         self.key_size = key_size // 8  # Convert bits to bytes
+        self._aead_cache: Dict[bytes, AESGCM] = {}  # key -> AESGCM with its key schedule set up
+    
+    def _aead(self, key: bytes) -> AESGCM:
+        """One-shot AES-GCM object for key, reused across messages"""
+        aead = self._aead_cache.get(key)
+        if aead is None:
+            if len(self._aead_cache) >= 256:
+                self._aead_cache.clear()
+            aead = self._aead_cache[key] = AESGCM(key)
+        return aead
         
     def generate_key(self) -> bytes:
         """Generate random AES key"""
@@ -168,11 +255,11 @@ class ProductionAES:
             salt = os.urandom(16)
         
         kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
+            algorithm=_SHA256,
             length=self.key_size,
             salt=salt,
             iterations=100000,
-            backend=default_backend()
+            backend=_BACKEND
         )
         key = kdf.derive(password.encode())
         return key, salt
@@ -182,38 +269,32 @@ class ProductionAES:
         # Generate random IV
         iv = os.urandom(12)  # GCM mode uses 96-bit IV
         
-        # Create cipher
-        cipher = Cipher(algorithms.AES(key), modes.GCM(iv), backend=default_backend())
-        encryptor = cipher.encryptor()
-        
-        # Encrypt data
-        ciphertext = encryptor.update(data) + encryptor.finalize()
+        # AESGCM encrypts in one OpenSSL call (AES-NI/CLMUL when available) without the per-message
+        # Cipher/encryptor setup; its output is ciphertext || tag
+        sealed = self._aead(key).encrypt(iv, data, None)
         
         return {
-            'ciphertext': ciphertext,
+            'ciphertext': sealed[:-self.GCM_TAG_SIZE],
             'iv': iv,
-            'tag': encryptor.tag  # Authentication tag
+            'tag': sealed[-self.GCM_TAG_SIZE:]  # Authentication tag
         }
     
     def decrypt(self, encrypted_data: Dict[str, bytes], key: bytes) -> bytes:
         """Decrypt data using AES-GCM"""
-        cipher = Cipher(
-            algorithms.AES(key),
-            modes.GCM(encrypted_data['iv'], encrypted_data['tag']),
-            backend=default_backend()
-        )
-        decryptor = cipher.decryptor()
-        
-        plaintext = decryptor.update(encrypted_data['ciphertext']) + decryptor.finalize()
-        return plaintext
+        # Raises cryptography.exceptions.InvalidTag on tampering, as the Cipher finalize did
+        return self._aead(key).decrypt(encrypted_data['iv'],
+                                       encrypted_data['ciphertext'] + encrypted_data['tag'], None)
 
 
 class ProductionSecretSharing:
     """Production-grade Shamir's Secret Sharing"""
     
+    # Fallback share header: share_id, threshold, total_shares, secret size (big-endian uint32s)
+    FALLBACK_HEADER = struct.Struct('>IIII')
+    
     @staticmethod
-    def split_secret(data: bytes, threshold: int, num_shares: int) -> List[str]:
-        """Split data into secret shares using Shamir's Secret Sharing"""
+    def split_secret(data: bytes, threshold: int, num_shares: int) -> List[Union[str, bytes]]:
+        """Split data into secret shares using Shamir's Secret Sharing (bytes shares in fallback mode)"""
         if not SECRETSHARING_AVAILABLE:
             return ProductionSecretSharing._fallback_split(data, threshold, num_shares)
         
@@ -225,7 +306,7 @@ class ProductionSecretSharing:
         return shares
     
     @staticmethod
-    def reconstruct_secret(shares: List[str]) -> bytes:
+    def reconstruct_secret(shares: List[Union[str, bytes]]) -> bytes:
         """Reconstruct secret from shares"""
         if not SECRETSHARING_AVAILABLE:
             return ProductionSecretSharing._fallback_reconstruct(shares)
@@ -237,60 +318,85 @@ class ProductionSecretSharing:
         return bytes.fromhex(secret_hex)
     
     @staticmethod
-    def _fallback_split(data: bytes, threshold: int, num_shares: int) -> List[str]:
+    def _fallback_split(data: bytes, threshold: int, num_shares: int) -> List[bytes]:
         """Fallback implementation when secretsharing library unavailable"""
         # Simple XOR-based splitting (not cryptographically secure)
         print("Warning: Using simplified secret sharing - not suitable for production")
         
-        shares = []
+        header = ProductionSecretSharing.FALLBACK_HEADER
         data_size = len(data)
         
-        for i in range(num_shares):
-            share_data = {
-                'share_id': i + 1,
-                'data': data[i::num_shares].hex() if i < data_size else '',
-                'threshold': threshold,
-                'total_shares': num_shares,
-                'size': data_size
-            }
-            shares.append(json.dumps(share_data))
-        
-        return shares
+        # Fixed binary header + raw fragment bytes: half the size of a hex-in-JSON envelope, no JSON to parse
+        return [header.pack(i + 1, threshold, num_shares, data_size) + data[i::num_shares]
+                for i in range(num_shares)]
     
     @staticmethod
-    def _fallback_reconstruct(shares: List[str]) -> bytes:
+    def _fallback_reconstruct(shares: List[Union[str, bytes]]) -> bytes:
         """Fallback reconstruction for simplified implementation"""
-        share_data = [json.loads(share) for share in shares]
+        header = ProductionSecretSharing.FALLBACK_HEADER
+        fragments = []
+        
+        for share in shares:
+            if isinstance(share, str):
+                # JSON envelope with hex data, as produced before the binary format
+                share = json.loads(share)
+                fragments.append((share['share_id'], share['total_shares'], share['size'],
+                                  bytes.fromhex(share['data'])))
+            else:
+                share_id, _, total_shares, data_size = header.unpack_from(share, 0)
+                fragments.append((share_id, total_shares, data_size, memoryview(share)[header.size:]))
         
-        # Reconstruct data by concatenating fragments
-        reconstructed = bytearray(share_data[0]['size'])
+        # Reconstruct data by interleaving fragments
+        data_size = fragments[0][2]
+        reconstructed = bytearray(data_size)
         
-        for share in share_data:
-            share_id = share['share_id'] - 1
-            fragment = bytes.fromhex(share['data'])
-            
-            for j, byte_val in enumerate(fragment):
-                pos = j * share['total_shares'] + share_id
-                if pos < len(reconstructed):
-                    reconstructed[pos] = byte_val
+        for share_id, total_shares, _, fragment in fragments:
+            # Share i holds bytes i, i + n, i + 2n, ...: one strided slice assignment (a C-level
+            # copy) places the whole fragment, mirroring the data[i::n] slice that produced it
+            positions = range(share_id - 1, data_size, total_shares)
+            reconstructed[share_id - 1::total_shares] = fragment[:len(positions)]
         
         return bytes(reconstructed)
 
 
+# PCG64 generator for DP noise: faster than the legacy Mersenne Twister behind np.random.normal,
+# and able to draw float32 directly
+_noise_rng = np.random.default_rng()
+NOISE_CHUNK_SIZE = 1 << 20  # Elements of noise generated per step when adding noise in place
+
+
+def _add_gaussian_noise_inplace(out: np.ndarray, noise_scale: float) -> np.ndarray:
+    """Add N(0, noise_scale^2) noise to a contiguous float array chunk by chunk, never allocating a
+    full-size noise tensor (peak memory stays ~1x and each chunk is consumed while cache-hot)"""
+    flat = out.reshape(-1)
+    chunk = np.empty(min(NOISE_CHUNK_SIZE, flat.size), dtype=out.dtype)
+    for start in range(0, flat.size, NOISE_CHUNK_SIZE):
+        block = chunk[:min(NOISE_CHUNK_SIZE, flat.size - start)]
+        _noise_rng.standard_normal(dtype=out.dtype, out=block)
+        block *= noise_scale
+        flat[start:start + block.size] += block
+    return out
+
+
 class ProductionDifferentialPrivacy:
     """Production-grade differential privacy mechanisms"""
     
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def gaussian_noise_scale(epsilon: float, delta: float, sensitivity: float = 1.0) -> float:
+        """Standard deviation of the Gaussian mechanism for (ε,δ)-differential privacy"""
+        return float(np.sqrt(2 * np.log(1.25 / delta)) * sensitivity / epsilon)
+    
     @staticmethod
     def add_gaussian_noise(data: np.ndarray, epsilon: float, delta: float, 
                           sensitivity: float = 1.0) -> np.ndarray:
         """Add calibrated Gaussian noise for (ε,δ)-differential privacy"""
         # Calculate noise scale using the Gaussian mechanism
-        noise_scale = np.sqrt(2 * np.log(1.25 / delta)) * sensitivity / epsilon
-        
-        # Generate Gaussian noise
-        noise = np.random.normal(0, noise_scale, data.shape)
+        noise_scale = ProductionDifferentialPrivacy.gaussian_noise_scale(epsilon, delta, sensitivity)
         
-        return data + noise
+        # Add Gaussian noise to a copy, in float32 for float32 data (half the memory, no upcast)
+        noise_dtype = np.float32 if data.dtype == np.float32 else np.float64
+        return _add_gaussian_noise_inplace(np.array(data, dtype=noise_dtype, order='C'), noise_scale)
     
     @staticmethod
     def add_laplace_noise(data: np.ndarray, epsilon: float, 
@@ -304,23 +410,45 @@ class ProductionDifferentialPrivacy:
         return data + noise
     
     @staticmethod
-    def clip_gradients(gradients: List[np.ndarray], max_norm: float) -> List[np.ndarray]:
-        """Clip gradients to bound sensitivity"""
-        clipped_gradients = []
-        
-        for grad in gradients:
-            # Calculate L2 norm
-            grad_norm = np.linalg.norm(grad)
-            
-            # Clip if necessary
-            if grad_norm > max_norm:
-                clipped_grad = grad * (max_norm / grad_norm)
-            else:
-                clipped_grad = grad
-                
-            clipped_gradients.append(clipped_grad)
-        
-        return clipped_gradients
+    def clip_gradients(gradients: List[np.ndarray], max_norm: float,
+                       global_norm: bool = False) -> List[np.ndarray]:
+        """Clip gradients to bound sensitivity, per tensor or (global_norm) jointly over all tensors"""
+        # L2 norms as sqrt of a flat dot product: one C call per tensor, no reshape/axis handling of np.linalg.norm
+        squared_norms = [float(np.vdot(grad, grad).real) for grad in gradients]
+        
+        if global_norm:
+            total_norm = math.sqrt(sum(squared_norms))
+            if total_norm <= max_norm:
+                return list(gradients)
+            scale = max_norm / total_norm
+            return [grad * scale for grad in gradients]
+        
+        # Tensors within the bound pass through uncopied; Python float scales keep float32 tensors float32
+        return [grad * (max_norm / math.sqrt(squared_norm)) if squared_norm > max_norm * max_norm else grad
+                for grad, squared_norm in zip(gradients, squared_norms)]
+
+
+def _xor_bytes(a: bytes, b: bytes) -> bytes:
+    """XOR two byte strings (truncated to the shorter, like zip) as one big-int operation"""
+    length = min(len(a), len(b))
+    return (int.from_bytes(a[:length], 'big') ^ int.from_bytes(b[:length], 'big')).to_bytes(length, 'big')
+
+
+@functools.lru_cache(maxsize=1024)
+def _policy_hash(access_policy: str, public_params: bytes) -> bytes:
+    """Key-wrapping pad for a policy; policies repeat per role, so this is cached"""
+    return hashlib.sha256((access_policy + public_params.hex()).encode()).digest()
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_policy(policy: str) -> Tuple[bool, Tuple[str, ...]]:
+    """Parse a policy once into (require_all, canonical conditions); decrypts then only do set lookups"""
+    if 'AND' in policy:
+        return True, tuple(ProductionCPABE._canonical_condition(cond) for cond in policy.split('AND'))
+    elif 'OR' in policy:
+        return False, tuple(ProductionCPABE._canonical_condition(cond) for cond in policy.split('OR'))
+    else:
+        return True, (ProductionCPABE._canonical_condition(policy),)
 
 
 class ProductionCPABE:
@@ -343,14 +471,16 @@ class ProductionCPABE:
         # Simplified implementation using HMAC-based key derivation
         attribute_string = json.dumps(sorted(attributes))
         
-        # Derive key material from master key and attributes
-        key_material = hashlib.pbkdf2_hmac(
-            'sha256',
-            attribute_string.encode(),
-            master_key,
-            100000,
-            32
+        # Derive key material from master key and attributes; cryptography's PBKDF2 runs the
+        # whole iteration loop inside OpenSSL and is ~2x faster than hashlib.pbkdf2_hmac (same output)
+        kdf = PBKDF2HMAC(
+            algorithm=_SHA256,
+            length=32,
+            salt=master_key,
+            iterations=100000,
+            backend=_BACKEND
         )
+        key_material = kdf.derive(attribute_string.encode())
         
         return {
             'attributes': attributes,
@@ -369,11 +499,9 @@ class ProductionCPABE:
         encrypted_data = aes.encrypt(data, symmetric_key)
         
         # "Encrypt" symmetric key with access policy (simplified)
-        policy_hash = hashlib.sha256(
-            (access_policy + public_params.hex()).encode()
-        ).digest()
+        policy_hash = _policy_hash(access_policy, public_params)
         
-        encrypted_key = bytes(a ^ b for a, b in zip(symmetric_key, policy_hash))
+        encrypted_key = _xor_bytes(symmetric_key, policy_hash)
         
         return {
             'encrypted_data': encrypted_data,
@@ -389,11 +517,9 @@ class ProductionCPABE:
             raise ValueError("Attributes do not satisfy access policy")
         
         # "Decrypt" symmetric key
-        policy_hash = hashlib.sha256(
-            (ciphertext['access_policy'] + self.public_params.hex()).encode()
-        ).digest()
+        policy_hash = _policy_hash(ciphertext['access_policy'], self.public_params)
         
-        symmetric_key = bytes(a ^ b for a, b in zip(ciphertext['encrypted_key'], policy_hash))
+        symmetric_key = _xor_bytes(ciphertext['encrypted_key'], policy_hash)
         
         # Decrypt data
         aes = ProductionAES()
@@ -406,74 +532,201 @@ class ProductionCPABE:
         # Simplified policy evaluation
         # In production, implement proper policy parser and evaluator
         
-        if 'AND' in policy:
-            conditions = [cond.strip() for cond in policy.split('AND')]
-            return all(self._evaluate_condition(cond, attributes) for cond in conditions)
-        elif 'OR' in policy:
-            conditions = [cond.strip() for cond in policy.split('OR')]
-            return any(self._evaluate_condition(cond, attributes) for cond in conditions)
-        else:
-            return self._evaluate_condition(policy, attributes)
+        require_all, conditions = _compile_policy(policy)
+        attribute_set = frozenset(attributes)
+        if require_all:
+            return all(condition in attribute_set for condition in conditions)
+        return any(condition in attribute_set for condition in conditions)
     
-    def _evaluate_condition(self, condition: str, attributes: List[str]) -> bool:
-        """Evaluate single condition against attributes"""
+    @staticmethod
+    def _canonical_condition(condition: str) -> str:
+        """Normalize a single condition to the attribute string it requires"""
         if '=' in condition:
             attr_name, attr_value = condition.split('=', 1)
-            return f"{attr_name.strip()}={attr_value.strip()}" in attributes
+            return f"{attr_name.strip()}={attr_value.strip()}"
         else:
-            return condition.strip() in attributes
+            return condition.strip()
+    
+    def _evaluate_condition(self, condition: str, attributes: List[str]) -> bool:
+        """Evaluate single condition against attributes"""
+        return self._canonical_condition(condition) in attributes
+
+
+def _pow_search_worker(start: int, stride: int, suffix: bytes, target_max: bytes, max_iterations: int,
+                       stop_event, result_queue):
+    """Try nonces start, start + stride, ... below max_iterations; report a solution or None when exhausted"""
+    # Step through the worker's nonces in chunks so the shared stop flag is polled once per 4096 attempts
+    chunk = stride * 4096
+    for chunk_start in range(start, max_iterations, chunk):
+        if stop_event.is_set():
+            break
+        for nonce in range(chunk_start, min(chunk_start + chunk, max_iterations), stride):
+            digest = hashlib.sha256(b"%d" % nonce + suffix).digest()
+            if digest <= target_max:
+                result_queue.put((nonce, digest.hex()))
+                stop_event.set()
+                return
+    result_queue.put(None)
 
 
 class ProductionProofOfWork:
     """Production-grade Proof-of-Work implementation"""
     
+    @staticmethod
+    def target_max_bytes(difficulty: int) -> bytes:
+        """Largest valid digest as 32 big-endian bytes: digest < 2**(256-d) <=> digest <= this"""
+        return (2 ** (256 - difficulty) - 1).to_bytes(32, 'big')
+    
     @staticmethod
     def solve_challenge(data: str, difficulty: int, max_iterations: int = 10**6) -> Tuple[int, str]:
         """Solve PoW challenge with given difficulty"""
-        target = 2 ** (256 - difficulty)
+        target_max = ProductionProofOfWork.target_max_bytes(difficulty)
+        # Only the nonce digits change between attempts: encode the constant tail once
+        suffix = b"||" + data.encode()
         
         for nonce in range(max_iterations):
-            challenge_input = f"{nonce}||{data}"
-            hash_result = hashlib.sha256(challenge_input.encode()).hexdigest()
-            hash_value = int(hash_result, 16)
+            digest = hashlib.sha256(b"%d" % nonce + suffix).digest()
             
-            if hash_value < target:
-                return nonce, hash_result
+            if digest <= target_max:
+                return nonce, digest.hex()
         
         raise RuntimeError(f"Failed to solve PoW challenge with difficulty {difficulty}")
     
+    @staticmethod
+    def solve_challenge_parallel(data: str, difficulty: int, max_iterations: int = 10**6,
+                                 num_workers: Optional[int] = None, timeout: float = 300.0) -> Tuple[int, str]:
+        """Solve PoW challenge with the nonce space strided across processes (first solution found wins)
+        
+        Workers are spawned, never forked: callers run threads (Flask, TensorFlow) that a fork could
+        deadlock. Spawned children re-import the caller's main module, so call this from lightweight
+        scripts only. Raises RuntimeError if no worker reports within timeout seconds.
+        """
+        num_workers = num_workers or os.cpu_count() or 1
+        target_max = ProductionProofOfWork.target_max_bytes(difficulty)
+        suffix = b"||" + data.encode()
+        
+        ctx = multiprocessing.get_context('spawn')
+        stop_event = ctx.Event()
+        result_queue = ctx.Queue()
+        workers = [ctx.Process(target=_pow_search_worker,
+                               args=(i, num_workers, suffix, target_max, max_iterations,
+                                     stop_event, result_queue),
+                               daemon=True)
+                   for i in range(num_workers)]
+        for worker in workers:
+            worker.start()
+        
+        # Every worker reports exactly once: a solution, or None when its nonces ran out
+        deadline = time.monotonic() + timeout
+        solution = None
+        timed_out = False
+        try:
+            for _ in range(num_workers):
+                solution = result_queue.get(timeout=max(deadline - time.monotonic(), 0))
+                if solution is not None:
+                    break
+        except queue.Empty:
+            timed_out = True
+        finally:
+            stop_event.set()
+            # Workers poll the stop flag every few thousand nonces; terminate any that do not exit
+            for worker in workers:
+                worker.join(timeout=max(deadline - time.monotonic(), 1))
+                if worker.is_alive():
+                    worker.terminate()
+                    worker.join()
+        
+        if timed_out:
+            raise RuntimeError(f"PoW challenge with difficulty {difficulty} not solved within {timeout}s")
+        if solution is None:
+            raise RuntimeError(f"Failed to solve PoW challenge with difficulty {difficulty}")
+        return solution
+    
     @staticmethod
     def verify_solution(data: str, nonce: int, hash_result: str, difficulty: int) -> bool:
         """Verify PoW solution"""
-        target = 2 ** (256 - difficulty)
-        
         # Recompute hash
-        challenge_input = f"{nonce}||{data}"
-        computed_hash = hashlib.sha256(challenge_input.encode()).hexdigest()
+        digest = hashlib.sha256(str(nonce).encode() + b"||" + data.encode()).digest()
         
         # Verify hash matches and meets difficulty
-        hash_value = int(computed_hash, 16)
-        return hash_value < target and computed_hash == hash_result
+        return digest <= ProductionProofOfWork.target_max_bytes(difficulty) and digest.hex() == hash_result
+
+
+class ProductionMerkleTree:
+    """SHA-256 Merkle tree so a single signature can commit to a whole batch of messages"""
+    
+    @staticmethod
+    def leaf_hash(data: bytes) -> bytes:
+        """Hash a leaf, domain-separated from interior nodes"""
+        return hashlib.sha256(b'\x00' + data).digest()
+    
+    @staticmethod
+    def node_hash(left: bytes, right: bytes) -> bytes:
+        """Hash two child nodes into their parent"""
+        return hashlib.sha256(b'\x01' + left + right).digest()
+    
+    @staticmethod
+    def build(leaves: List[bytes]) -> Tuple[bytes, List[List[Tuple[str, bool]]]]:
+        """Return the Merkle root and, per leaf, its inclusion proof as (sibling hex, sibling_is_left) pairs"""
+        if not leaves:
+            raise ValueError("Cannot build a Merkle tree without leaves")
+        
+        proofs = [[] for _ in leaves]
+        positions = list(range(len(leaves)))  # Index of each leaf's ancestor in the current level
+        level = list(leaves)
+        while len(level) > 1:
+            # Odd levels pair the last node with itself
+            if len(level) % 2:
+                level.append(level[-1])
+            for leaf_index, position in enumerate(positions):
+                sibling = position ^ 1
+                proofs[leaf_index].append((level[sibling].hex(), sibling < position))
+                positions[leaf_index] = position // 2
+            level = [ProductionMerkleTree.node_hash(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+        
+        return level[0], proofs
+    
+    @staticmethod
+    def verify_proof(leaf: bytes, proof: List[Tuple[str, bool]], root: bytes) -> bool:
+        """Check that leaf is included under root"""
+        node = leaf
+        for sibling_hex, sibling_is_left in proof:
+            sibling = bytes.fromhex(sibling_hex)
+            node = ProductionMerkleTree.node_hash(sibling, node) if sibling_is_left else ProductionMerkleTree.node_hash(node, sibling)
+        return node == root
 
 
 def secure_model_aggregation(model_weights_list: List[np.ndarray], 
                            crypto_config: CryptoConfig) -> np.ndarray:
     """Securely aggregate model weights with differential privacy"""
-    # Clip gradients for bounded sensitivity
-    dp = ProductionDifferentialPrivacy()
-    clipped_weights = [dp.clip_gradients([w], 1.0)[0] for w in model_weights_list]
+    # Clip, average and add noise through one accumulator instead of materializing the clipped
+    # list, the mean and the noisy copy (same result, one pass per model over memory)
+    num_models = len(model_weights_list)
+    # float32 accumulation halves the memory traffic of the float64 default; NumPy has no native
+    # float16 arithmetic on CPU, so lower precisions would only add conversion work
+    if crypto_config.low_precision_aggregation:
+        # Each update is cast down on ingest by the multiply below, whatever its input dtype
+        accumulate_dtype = np.float32
+    else:
+        accumulate_dtype = np.result_type(model_weights_list[0], np.float64)
+    aggregated = np.zeros(np.shape(model_weights_list[0]), dtype=accumulate_dtype)
+    scaled = np.empty_like(aggregated)
     
-    # Compute average
-    aggregated = np.mean(clipped_weights, axis=0)
+    for weights in model_weights_list:
+        # Clip to unit L2 norm for bounded sensitivity, folded into the 1/n of the mean
+        squared_norm = float(np.vdot(weights, weights).real)
+        clip_scale = 1.0 / math.sqrt(squared_norm) if squared_norm > 1.0 else 1.0
+        np.multiply(weights, clip_scale / num_models, out=scaled)
+        aggregated += scaled
     
-    # Add differential privacy noise
-    private_aggregated = dp.add_gaussian_noise(
-        aggregated, 
+    # Add differential privacy noise in place
+    noise_scale = ProductionDifferentialPrivacy.gaussian_noise_scale(
         crypto_config.privacy_epsilon, 
         crypto_config.privacy_delta
     )
+    _add_gaussian_noise_inplace(aggregated, noise_scale)
     
-    return private_aggregated
+    return aggregated
 
 
 # Example usage and testing
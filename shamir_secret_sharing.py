@@ -3,232 +3,248 @@
 Real Shamir Secret Sharing Implementation
 Using polynomial interpolation over finite field GF(2^8) for security
 """
-import random
+import functools
 import numpy as np
 import pickle
-import base64
+from binascii import a2b_base64, b2a_base64
+
+
+def _build_gf256_tables():
+    """Exp/log tables for GF(2^8) with the AES polynomial x^8 + x^4 + x^3 + x + 1 (0x11B), generator 3"""
+    exp = np.zeros(510, dtype=np.uint8)
+    log = np.zeros(256, dtype=np.int32)
+    value = 1
+    for i in range(255):
+        exp[i] = value
+        log[value] = i
+        value ^= (value << 1) ^ (0x11B if value & 0x80 else 0)  # value * 3
+    exp[255:] = exp[:255]
+    return exp, log
+
+
+_GF256_EXP, _GF256_LOG = _build_gf256_tables()
+# Full 256x256 product table (64 KB): row a is "multiply by a", so a constant times an array is one lookup
+_GF256_MUL = _GF256_EXP[_GF256_LOG[:, None] + _GF256_LOG[None, :]]
+_GF256_MUL[0, :] = 0
+_GF256_MUL[:, 0] = 0
+# Multiplicative inverses a^-1 = g^(255 - log a); index 0 has no inverse
+_GF256_INV = _GF256_EXP[255 - _GF256_LOG]
+_GF256_INV[0] = 0
+
+
+@functools.lru_cache(maxsize=32)
+def _gf256_lagrange_weights(xs):
+    """Lagrange basis values L_i(0) in GF(2^8) for a tuple of x-coordinates (cached, read-only)"""
+    weights = np.empty(len(xs), dtype=np.uint8)
+    for i, xi in enumerate(xs):
+        numerator = 1
+        denominator = 1
+        for j, xj in enumerate(xs):
+            if i != j:
+                # Characteristic 2: (0 - xj) is xj and (xi - xj) is xi ^ xj
+                numerator = int(_GF256_MUL[numerator, xj])
+                denominator = int(_GF256_MUL[denominator, xi ^ xj])
+        if denominator == 0:
+            raise ValueError("Share x-coordinates must be distinct")
+        weights[i] = _GF256_MUL[numerator, _GF256_INV[denominator]]
+    # Shared between callers through the cache
+    weights.flags.writeable = False
+    return weights
 
 
 class ShamirSecretSharing:
     """Real Shamir Secret Sharing implementation using polynomial interpolation"""
     
     def __init__(self, threshold, num_shares):
+        if num_shares > 255:
+            raise ValueError("GF(2^8) supports at most 255 shares")
         self.threshold = threshold
         self.num_shares = num_shares
-        self.prime = 257  # Use prime for finite field operations
-        
-    def _mod_inverse(self, a, m=None):
-        """Calculate modular multiplicative inverse using extended Euclidean algorithm"""
-        if m is None:
-            m = self.prime
-        
-        def extended_gcd(a, b):
-            if a == 0:
-                return b, 0, 1
-            gcd, x1, y1 = extended_gcd(b % a, a)
-            x = y1 - (b // a) * x1
-            y = x1
-            return gcd, x, y
-        
-        gcd, x, _ = extended_gcd(a % m, m)
-        if gcd != 1:
-            raise ValueError("Modular inverse does not exist")
-        return (x % m + m) % m
-    
-    def _polynomial_eval(self, coefficients, x):
-        """Evaluate polynomial at point x using Horner's method"""
-        result = 0
-        for coeff in reversed(coefficients):
-            result = (result * x + coeff) % self.prime
-        return result
-    
-    def _lagrange_interpolation(self, shares, x=0):
-        """Reconstruct secret using Lagrange interpolation"""
-        if len(shares) < self.threshold:
-            raise ValueError(f"Need at least {self.threshold} shares, got {len(shares)}")
-        
-        # Use first 'threshold' shares for reconstruction
-        shares = shares[:self.threshold]
-        
-        result = 0
-        for i, (xi, yi) in enumerate(shares):
-            # Calculate Lagrange basis polynomial
-            numerator = 1
-            denominator = 1
-            
-            for j, (xj, _) in enumerate(shares):
-                if i != j:
-                    numerator = (numerator * (x - xj)) % self.prime
-                    denominator = (denominator * (xi - xj)) % self.prime
-            
-            # Calculate modular inverse of denominator
-            denominator_inv = self._mod_inverse(denominator)
-            lagrange_basis = (numerator * denominator_inv) % self.prime
-            
-            result = (result + yi * lagrange_basis) % self.prime
-        
-        return result % self.prime
+        self.rng = np.random.default_rng()
     
     def split_secret(self, secret_bytes):
         """Split secret bytes into shares using polynomial interpolation"""
-        shares = [[] for _ in range(self.num_shares)]
+        secret = np.frombuffer(secret_bytes, dtype=np.uint8)
         
-        # Process each byte of the secret
-        for byte_val in secret_bytes:
-            # Generate random coefficients for polynomial of degree (threshold-1)
-            coefficients = [byte_val]  # Secret is the constant term
-            for _ in range(self.threshold - 1):
-                coefficients.append(random.randint(0, self.prime - 1))
-            
-            # Evaluate polynomial at points 1, 2, ..., num_shares
-            for i in range(self.num_shares):
-                x = i + 1  # Use 1-based indexing to avoid x=0
-                y = self._polynomial_eval(coefficients, x)
-                shares[i].append((x, y))
+        # One random polynomial of degree (threshold-1) per byte; the secret byte is the constant term
+        coeffs = self.rng.integers(0, 256, size=(self.threshold - 1, len(secret)), dtype=np.uint8)
+        
+        # OPTIMIZATION: Horner's rule across all bytes at once. In GF(2^8) addition is XOR and multiplying
+        # by the constant x is a lookup in row x of the product table; x runs 1..num_shares to avoid x=0
+        shares = []
+        for x in range(1, self.num_shares + 1):
+            mul_x = _GF256_MUL[x]
+            y = np.zeros(len(secret), dtype=np.uint8)
+            for coeff_row in coeffs[::-1]:
+                y = mul_x[y] ^ coeff_row
+            # Each share is one contiguous uint8 array of y-values; its x-coordinate is implicit
+            shares.append(mul_x[y] ^ secret)
         
         return shares
     
-    def reconstruct_secret(self, shares_subset):
-        """Reconstruct secret from subset of shares"""
+    def reconstruct_secret(self, shares_subset, x_coords=None):
+        """Reconstruct secret from subset of shares (x_coords default to 1..len(shares_subset))"""
         if len(shares_subset) < self.threshold:
             raise ValueError(f"Need at least {self.threshold} shares")
         
-        # Determine secret length from first share
-        secret_length = len(shares_subset[0])
-        secret_bytes = bytearray()
+        if x_coords is None:
+            x_coords = range(1, len(shares_subset) + 1)
+        # OPTIMIZATION: Weights depend only on the x-set, so every facility after the first hits the cache
+        weights = _gf256_lagrange_weights(tuple(int(x) for x in x_coords)[:self.threshold])
         
-        # Reconstruct each byte
-        for byte_idx in range(secret_length):
-            # Extract shares for this byte position
-            byte_shares = []
-            for share in shares_subset:
-                if byte_idx < len(share):
-                    byte_shares.append(share[byte_idx])
-            
-            if len(byte_shares) >= self.threshold:
-                # Reconstruct this byte using Lagrange interpolation
-                reconstructed_byte = self._lagrange_interpolation(byte_shares, x=0)
-                secret_bytes.append(reconstructed_byte)
+        # Interpolate every byte at x=0 at once: secret = XOR_i (w_i * y_i)
+        secret = np.zeros(len(shares_subset[0]), dtype=np.uint8)
+        for weight, share in zip(weights, shares_subset[:self.threshold]):
+            secret ^= _GF256_MUL[weight][share]
         
-        return bytes(secret_bytes)
+        return secret.tobytes()
 
 
 class OptimizedShamirSecretSharing:
     """Optimized Shamir Secret Sharing using vectorized NumPy operations with correct finite field math"""
     
+    # Large-committee thresholds use Estrin's scheme: log2(t) dependent steps per byte instead of Horner's t-1
+    ESTRIN_MIN_THRESHOLD = 8
+    
     def __init__(self, threshold, num_shares):
         if threshold > num_shares:
             raise ValueError("Threshold cannot be greater than number of shares")
+        if num_shares > 255:
+            raise ValueError("GF(2^8) supports at most 255 shares")
         self.threshold = threshold
         self.num_shares = num_shares
-        self.prime = 257  # Use prime for finite field operations (same as original)
-        # Pre-generate random coefficients using NumPy for better performance
-        self.rng = np.random.RandomState(42)  # Seed for reproducibility during development
-        
-    def _mod_inverse(self, a, m=None):
-        """Calculate modular multiplicative inverse using extended Euclidean algorithm"""
-        if m is None:
-            m = self.prime
-        
-        def extended_gcd(a, b):
-            if a == 0:
-                return b, 0, 1
-            gcd, x1, y1 = extended_gcd(b % a, a)
-            x = y1 - (b // a) * x1
-            y = x1
-            return gcd, x, y
-        
-        gcd, x, _ = extended_gcd(a % m, m)
-        if gcd != 1:
-            raise ValueError("Modular inverse does not exist")
-        return (x % m + m) % m
+        # PCG64 generator seeded from OS entropy; a fixed seed would make every polynomial predictable
+        self.rng = np.random.default_rng()
+    
+    def _estrin_eval(self, poly, x):
+        """Evaluate (2^k, bytes) coefficient rows, lowest degree first, at x with Estrin's scheme"""
+        x_power = x
+        while poly.shape[0] > 1:
+            # (c0 + c1*x), (c2 + c3*x), ... then the same on the halves with x^2, x^4, ...
+            poly = poly[0::2] ^ _GF256_MUL[x_power][poly[1::2]]
+            x_power = _GF256_MUL[x_power, x_power]
+        return poly[0]
         
     def split_secret(self, secret_bytes):
         """Vectorized secret splitting with correct finite field operations"""
         secret_array = np.frombuffer(secret_bytes, dtype=np.uint8)
         
-        # Pre-generate polynomial coefficients (vectorized) - use prime field
-        coeffs = self.rng.randint(0, self.prime, size=(len(secret_array), self.threshold - 1))
+        # Pre-generate polynomial coefficients (vectorized), one row per degree
+        coeffs = self.rng.integers(0, 256, size=(self.threshold - 1, len(secret_array)), dtype=np.uint8)
+        
+        use_estrin = self.threshold >= self.ESTRIN_MIN_THRESHOLD
+        if use_estrin:
+            # Full coefficient matrix [secret, a1, ..., a_{t-1}] zero-padded to a power-of-two height
+            width = 1 << (self.threshold - 1).bit_length()
+            poly = np.zeros((width, len(secret_array)), dtype=np.uint8)
+            poly[0] = secret_array
+            poly[1:self.threshold] = coeffs
         
         shares = []
         for share_idx in range(self.num_shares):
             x = share_idx + 1  # x-coordinate (1-indexed)
             
-            # Vectorized polynomial evaluation: f(x) = secret + a1*x + a2*x^2 + ...
-            share_y_values = secret_array.astype(np.uint32)  # Prevent overflow
-            for power in range(self.threshold - 1):
-                term = (coeffs[:, power] * (x ** (power + 1))) % self.prime
-                share_y_values = (share_y_values + term) % self.prime
+            if use_estrin:
+                shares.append(self._estrin_eval(poly, x))
+                continue
             
-            # Format as (x, y) pairs like original implementation
-            share_data = []
-            for byte_idx, y_val in enumerate(share_y_values):
-                share_data.append((x, int(y_val)))
+            # Horner's rule in GF(2^8): f(x) = secret ^ x*(a1 ^ x*(a2 ^ ...)), multiply-by-x as a table row lookup
+            mul_x = _GF256_MUL[x]
+            acc = np.zeros(len(secret_array), dtype=np.uint8)
+            for coeff_row in coeffs[::-1]:
+                acc = mul_x[acc] ^ coeff_row
             
-            shares.append(share_data)
+            # Same layout as ShamirSecretSharing: one uint8 y-value array per share, x implicit
+            shares.append(mul_x[acc] ^ secret_array)
             
         return shares
     
-    def reconstruct_secret(self, shares_subset):
+    def reconstruct_secret(self, shares_subset, x_coords=None):
         """Vectorized secret reconstruction with correct Lagrange interpolation"""
         if len(shares_subset) < self.threshold:
             raise ValueError(f"Need at least {self.threshold} shares")
         
-        # Use only the required number of shares
-        shares_to_use = shares_subset[:self.threshold]
+        if x_coords is None:
+            x_coords = range(1, len(shares_subset) + 1)
+        weights = _gf256_lagrange_weights(tuple(int(x) for x in x_coords)[:self.threshold])
         
-        # Determine secret length from first share
-        secret_length = len(shares_to_use[0])
-        secret_bytes = bytearray()
-        
-        # Reconstruct each byte using proper finite field Lagrange interpolation
-        for byte_idx in range(secret_length):
-            # Extract (x, y) pairs for this byte position
-            points = []
-            for share in shares_to_use:
-                if byte_idx < len(share):
-                    x, y = share[byte_idx]
-                    points.append((x, y))
-            
-            if len(points) >= self.threshold:
-                # Perform Lagrange interpolation at x=0 using modular inverse
-                reconstructed_byte = 0
-                for i, (x_i, y_i) in enumerate(points):
-                    # Calculate Lagrange basis polynomial L_i(0)
-                    numerator = 1
-                    denominator = 1
-                    for j, (x_j, y_j) in enumerate(points):
-                        if i != j:
-                            numerator = (numerator * (0 - x_j)) % self.prime
-                            denominator = (denominator * (x_i - x_j)) % self.prime
-                    
-                    # Use modular inverse instead of integer division
-                    if denominator != 0:
-                        denominator_inv = self._mod_inverse(denominator, self.prime)
-                        lagrange_coeff = (numerator * denominator_inv) % self.prime
-                        reconstructed_byte = (reconstructed_byte + y_i * lagrange_coeff) % self.prime
-                
-                secret_bytes.append(reconstructed_byte % 256)
+        # Use only the required number of shares; one weighted XOR-sum interpolates every byte at x=0
+        secret = np.zeros(len(shares_subset[0]), dtype=np.uint8)
+        for weight, share in zip(weights, shares_subset[:self.threshold]):
+            secret ^= _GF256_MUL[weight][share]
         
-        return bytes(secret_bytes)
+        return secret.tobytes()
+
+
+def _serialize_secret(data):
+    """Bytes-like view of the secret plus the size_info entries needed to restore it"""
+    # OPTIMIZATION: Facilities share already-serialized model blobs; only arbitrary objects go through pickle
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return data, {'payload': 'bytes'}
+    if isinstance(data, np.ndarray) and not data.dtype.hasobject:
+        # Zero-copy uint8 view of a contiguous array instead of a tobytes() copy
+        flat = np.ascontiguousarray(data).reshape(-1).view(np.uint8)
+        return flat, {'payload': 'ndarray', 'payload_dtype': data.dtype.str, 'payload_shape': list(data.shape)}
+    return pickle.dumps(data), {'payload': 'pickle'}
+
+
+def _deserialize_secret(secret_bytes, size_info):
+    """Inverse of _serialize_secret; shares without a payload tag are pickles"""
+    payload = size_info.get('payload', 'pickle')
+    if payload == 'bytes':
+        return secret_bytes
+    if payload == 'ndarray':
+        return np.frombuffer(secret_bytes, dtype=size_info['payload_dtype']).reshape(size_info['payload_shape'])
+    return pickle.loads(secret_bytes)
+
+
+def _format_shares(fragments, threshold, total_size, payload_info):
+    """Wrap base64-encoded uint8 share buffers into the share dicts shipped to validators"""
+    num_shares = len(fragments)
+    formatted_shares = []
+    for i, fragment in enumerate(fragments):
+        share_data = {
+            'share_id': i + 1,
+            'data_fragment': fragment,
+            'size_info': {
+                'index': i,
+                'total': num_shares,
+                'total_size': total_size,
+                # GF(2^8) shares hold one byte per secret byte
+                'share_size': total_size,
+                'dtype': 'uint8',
+                'length': total_size,
+                **payload_info
+            },
+            'threshold': threshold,
+            'total_shares': num_shares,
+            'is_real_sss': True  # Mark as real SSS
+        }
+        formatted_shares.append(share_data)
+    return formatted_shares
 
 
-def _chunked_secret_sharing(data_bytes, num_shares, threshold, chunk_size):
+def _chunked_secret_sharing(data_bytes, num_shares, threshold, chunk_size, payload_info):
     """Process large data in chunks to prevent hanging - OPTIMIZED VERSION"""
     import time
     import numpy as np
     
+    # Base64 of a 3-byte multiple has no padding, so per-chunk encodings concatenate into one valid fragment
+    chunk_size -= chunk_size % 3
+    
     # OPTIMIZATION: Use memoryview for zero-copy slicing
     data_view = memoryview(data_bytes)
     num_chunks = (len(data_bytes) + chunk_size - 1) // chunk_size
     
     print(f"Processing {num_chunks} chunks of ~{chunk_size} bytes each...")
     
+    # OPTIMIZATION: Stream each chunk's share bytes straight into base64 pieces; the full raw share
+    # arrays are never materialized, so peak memory is the encoded output plus one chunk
+    encoded_parts = [[] for _ in range(num_shares)]
+    
     # Use OptimizedShamirSecretSharing for better performance while maintaining correctness
     sss = OptimizedShamirSecretSharing(threshold, num_shares)
     
-    all_shares = [[] for _ in range(num_shares)]
-    
     # OPTIMIZATION: Process chunks using memoryview (zero-copy)
     for chunk_idx in range(num_chunks):
         start_time = time.time()
@@ -236,14 +252,13 @@ def _chunked_secret_sharing(data_bytes, num_shares, threshold, chunk_size):
         # Extract chunk using memoryview (zero-copy)
         start_pos = chunk_idx * chunk_size
         end_pos = min(start_pos + chunk_size, len(data_bytes))
-        chunk_data = bytes(data_view[start_pos:end_pos])
+        chunk_data = data_view[start_pos:end_pos]  # split_secret reads it via np.frombuffer, no bytes() copy needed
         
         # Process this chunk
         chunk_shares = sss.split_secret(chunk_data)
         
-        # Combine with previous shares
         for share_idx in range(num_shares):
-            all_shares[share_idx].extend(chunk_shares[share_idx])
+            encoded_parts[share_idx].append(b2a_base64(chunk_shares[share_idx], newline=False).decode('ascii'))
         
         elapsed = time.time() - start_time
         if chunk_idx % 10 == 0 or elapsed > 1.0:  # Log progress every 10 chunks or if slow
@@ -251,24 +266,8 @@ def _chunked_secret_sharing(data_bytes, num_shares, threshold, chunk_size):
     
     print("Chunked secret sharing completed, formatting shares...")
     
-    # Format shares for compatibility with existing code
-    formatted_shares = []
-    for i, share in enumerate(all_shares):
-        share_bytes = pickle.dumps(share)
-        share_data = {
-            'share_id': i + 1,
-            'data_fragment': base64.b64encode(share_bytes).decode('utf-8'),
-            'size_info': {
-                'index': i,
-                'total': num_shares,
-                'total_size': len(data_bytes),
-                'share_size': len(share_bytes)
-            },
-            'threshold': threshold,
-            'total_shares': num_shares,
-            'is_real_sss': True  # Mark as real SSS
-        }
-        formatted_shares.append(share_data)
+    formatted_shares = _format_shares([''.join(parts) for parts in encoded_parts], threshold,
+                                      len(data_bytes), payload_info)
     
     print(f"Successfully created {len(formatted_shares)} real Shamir secret shares via chunking")
     return formatted_shares
@@ -276,8 +275,8 @@ def _chunked_secret_sharing(data_bytes, num_shares, threshold, chunk_size):
 
 def shamirs_secret_sharing(data, num_shares, threshold):
     """Split data into real secret shares using Shamir's Secret Sharing"""
-    # Serialize the data
-    data_bytes = pickle.dumps(data)
+    # Serialize the data (raw buffers pass through untouched)
+    data_bytes, payload_info = _serialize_secret(data)
     
     print(f"Creating {num_shares} secret shares with threshold {threshold} (total size: {len(data_bytes)} bytes)")
     
@@ -285,7 +284,7 @@ def shamirs_secret_sharing(data, num_shares, threshold):
     chunk_size = 65536  # Process in 64KB chunks (reduced from 256KB) for better resource management
     if len(data_bytes) > chunk_size:
         print(f"Large data detected ({len(data_bytes)} bytes), using chunked processing...")
-        return _chunked_secret_sharing(data_bytes, num_shares, threshold, chunk_size)
+        return _chunked_secret_sharing(data_bytes, num_shares, threshold, chunk_size, payload_info)
     
     # Initialize Shamir Secret Sharing
     sss = ShamirSecretSharing(threshold, num_shares)
@@ -293,25 +292,9 @@ def shamirs_secret_sharing(data, num_shares, threshold):
     # Split the secret
     raw_shares = sss.split_secret(data_bytes)
     
-    # Format shares for compatibility with existing code
-    formatted_shares = []
-    for i, share in enumerate(raw_shares):
-        # Encode share as base64 for JSON compatibility
-        share_bytes = pickle.dumps(share)
-        share_data = {
-            'share_id': i + 1,
-            'data_fragment': base64.b64encode(share_bytes).decode('utf-8'),
-            'size_info': {
-                'index': i,
-                'total': num_shares,
-                'total_size': len(data_bytes),
-                'share_size': len(share_bytes)
-            },
-            'threshold': threshold,
-            'total_shares': num_shares,
-            'is_real_sss': True  # Mark as real SSS
-        }
-        formatted_shares.append(share_data)
+    # Encode share as base64 for JSON compatibility
+    fragments = [b2a_base64(share, newline=False).decode('ascii') for share in raw_shares]
+    formatted_shares = _format_shares(fragments, threshold, len(data_bytes), payload_info)
     
     print(f"Successfully created {len(formatted_shares)} real Shamir secret shares")
     return formatted_shares
@@ -325,28 +308,23 @@ def reconstruct_secret_shares(shares_by_facility):
         print(f"Reconstructing facility {facility_id} from {len(facility_shares_dict)} shares")
         
         try:
-            # Extract and decode shares
-            raw_shares = []
-            threshold = None
-            total_shares = None
+            # Keep only real SSS shares up front so the decode loop below has no branches
+            sss_shares = [share_info['share'] for share_info in facility_shares_dict.values()
+                          if share_info['share'].get('is_real_sss', False)]
+            if len(sss_shares) < len(facility_shares_dict):
+                print(f"Warning: {len(facility_shares_dict) - len(sss_shares)} shares are not real SSS format")
+            if not sss_shares:
+                print(f"No real SSS shares for facility {facility_id}")
+                continue
+            
+            # Get threshold and total_shares from first share
+            threshold = sss_shares[0].get('threshold', 2)
+            total_shares = sss_shares[0].get('total_shares', 3)
             
-            for share_id, share_info in facility_shares_dict.items():
-                share_data = share_info['share']
-                
-                # Get threshold and total_shares from first share
-                if threshold is None:
-                    threshold = share_data.get('threshold', 2)
-                    total_shares = share_data.get('total_shares', 3)
-                
-                # Check if this is real SSS
-                if not share_data.get('is_real_sss', False):
-                    print(f"Warning: Share {share_id} is not real SSS format")
-                    continue
-                
-                # Decode the share
-                share_bytes = base64.b64decode(share_data['data_fragment'])
-                share = pickle.loads(share_bytes)
-                raw_shares.append(share)
+            # Decode the shares (binascii directly, skipping the base64 module wrapper) straight into arrays
+            raw_shares = [np.frombuffer(a2b_base64(share_data['data_fragment']), dtype=share_data['size_info']['dtype'])
+                          for share_data in sss_shares]
+            x_coords = [share_data['share_id'] for share_data in sss_shares]
             
             if len(raw_shares) < threshold:
                 print(f"Insufficient shares for facility {facility_id}: {len(raw_shares)} < {threshold}")
@@ -356,10 +334,10 @@ def reconstruct_secret_shares(shares_by_facility):
             sss = ShamirSecretSharing(threshold, total_shares)
             
             # Reconstruct the secret
-            reconstructed_bytes = sss.reconstruct_secret(raw_shares)
+            reconstructed_bytes = sss.reconstruct_secret(raw_shares, x_coords)
             
             # Deserialize the model parameters
-            model_params = pickle.loads(reconstructed_bytes)
+            model_params = _deserialize_secret(reconstructed_bytes, sss_shares[0]['size_info'])
             facility_models[facility_id] = model_params
             
             print(f"Successfully reconstructed facility {facility_id} model using real SSS")
@@ -29,16 +29,40 @@ nohup python logger_server.py &>logs/${DEST_DIRECTORY}/logger_server.log &
 echo "Logger server started"
 sleep 1
 
+# Serve the TA, validators, fog nodes and leader from gunicorn (keep-alive, thread pool) when installed
+# instead of the Werkzeug development server. -w 1 is required: round state (registered_facilities,
+# vote_records, received_shares, fog_aggregations) lives in process-local module globals.
+if command -v gunicorn >/dev/null 2>&1; then
+  USE_GUNICORN=1
+  TA_ADDRESS=$(python -c "from config import HierConfig; print(HierConfig().ta_address)")
+  TA_PORT=$(python -c "from config import HierConfig; print(HierConfig().ta_port)")
+  VALIDATOR_BASE_PORT=$(python -c "from config import HierConfig; print(HierConfig().committee_base_port)")
+  FOG_BASE_PORT=$(python -c "from config import HierConfig; print(HierConfig().fog_node_base_port)")
+  SERVER_ADDRESS=$(python -c "from config import HierConfig; print(HierConfig().server_address)")
+  LEADER_PORT=$(python -c "from config import HierConfig; print(HierConfig().leader_port)")
+  MASTER_SERVER_ADDRESS=$(python -c "from config import HierConfig; print(HierConfig().master_server_address)")
+fi
+
 # Step 2: Start Trusted Authority
 echo "Starting Trusted Authority..."
-nohup python hierta.py &>logs/${DEST_DIRECTORY}/hierta.log &
+if [ -n "${USE_GUNICORN}" ]; then
+  nohup gunicorn -k gthread -w 1 --threads 32 --keep-alive 30 --timeout 120 \
+    --bind "${TA_ADDRESS}:${TA_PORT}" hierta:api &>logs/${DEST_DIRECTORY}/hierta.log &
+else
+  nohup python hierta.py &>logs/${DEST_DIRECTORY}/hierta.log &
+fi
 echo "Trusted Authority started"
 
 # Step 3: Start Validator Committee
 echo "Starting Validator Committee..."
 for ((VALIDATOR = 0; VALIDATOR < VALIDATORS; VALIDATOR++)); do
   echo "  Starting validator ${VALIDATOR}..."
-  nohup python hiervalidator.py "${VALIDATOR}" &>logs/${DEST_DIRECTORY}/hiervalidator-${VALIDATOR}.log &
+  if [ -n "${USE_GUNICORN}" ]; then
+    VALIDATOR_INDEX="${VALIDATOR}" nohup gunicorn -k gthread -w 1 --threads 16 --keep-alive 30 \
+      --bind "${SERVER_ADDRESS}:$((VALIDATOR_BASE_PORT + VALIDATOR))" hiervalidator:api &>logs/${DEST_DIRECTORY}/hiervalidator-${VALIDATOR}.log &
+  else
+    nohup python hiervalidator.py "${VALIDATOR}" &>logs/${DEST_DIRECTORY}/hiervalidator-${VALIDATOR}.log &
+  fi
 done
 echo "All validators started"
 
@@ -46,13 +70,23 @@ echo "All validators started"
 echo "Starting Fog Nodes..."
 for ((FOG = 0; FOG < FOG_NODES; FOG++)); do
   echo "  Starting fog node ${FOG}..."
-  nohup python hierfognode.py "${FOG}" &>logs/${DEST_DIRECTORY}/hierfognode-${FOG}.log &
+  if [ -n "${USE_GUNICORN}" ]; then
+    FOG_NODE_INDEX="${FOG}" nohup gunicorn -w 1 --threads 16 --keep-alive 30 \
+      --bind "${SERVER_ADDRESS}:$((FOG_BASE_PORT + FOG))" hierfognode:api &>logs/${DEST_DIRECTORY}/hierfognode-${FOG}.log &
+  else
+    nohup python hierfognode.py "${FOG}" &>logs/${DEST_DIRECTORY}/hierfognode-${FOG}.log &
+  fi
 done
 echo "All fog nodes started"
 
 # Step 5: Start Leader Server
 echo "Starting Leader Server..."
-nohup python hierleadserver.py &>logs/${DEST_DIRECTORY}/hierleadserver.log &
+if [ -n "${USE_GUNICORN}" ]; then
+  nohup gunicorn -k gthread -w 1 --threads 16 --keep-alive 30 --timeout 120 \
+    --bind "${MASTER_SERVER_ADDRESS}:${LEADER_PORT}" hierleadserver:api &>logs/${DEST_DIRECTORY}/hierleadserver.log &
+else
+  nohup python hierleadserver.py &>logs/${DEST_DIRECTORY}/hierleadserver.log &
+fi
 echo "Leader server started"
 
 # Wait for infrastructure to initialize